@@ -1,47 +1,69 @@
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request, Response
 from typing import List, Optional, Dict, Any
 import asyncio
-import tempfile
-import os
+import hashlib
 from pathlib import Path
 
-from app.services.pdf_parser import pdf_parser
-from app.services.chemical_analyzer import chem_analyzer
-from app.services.patent_analyzer import patent_analyzer
-from app.services.molecular_visualizer import molecular_calculator
+from app.services.pdf_parser import parse_pdf_sync
+from app.services.chemical_analyzer import chem_analyzer, analyze_chemical_structure_sync
+from app.services.patent_analyzer import analyze_patent_claims_sync
+from app.services.molecular_visualizer import summarize_molecules_sync
+from app.services.property_batcher import property_batcher
+from app.pipeline import comprehensive_pipeline
 from app.models.schemas import *
 from app.core.config import settings
+from app.core.executor import run_in_pool
+from app.core.cache import PDF_CACHE
+from app.utils.upload import SNIFF_BYTES, sniff, stream_multipart_to_disk
 from loguru import logger
 
 router = APIRouter()
 
-# PDF解析端點
-@router.post("/parse-pdf", response_model=PDFParseResponse)
-async def parse_pdf(
-    file: UploadFile = File(...),
-    language: str = Form("auto")
-):
+# 熱路徑使用的配置值（Settings不可變，導入時綁定即可）
+_MAX_MOL = settings.MAX_MOLECULES_PER_REQUEST
+
+# PDF解析端點（請求體直接流式解析，表單結構在OpenAPI中聲明）
+@router.post(
+    "/parse-pdf",
+    response_model=PDFParseResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {
+                            "file": {"type": "string", "format": "binary"},
+                            "language": {"type": "string", "default": "auto"}
+                        }
+                    }
+                }
+            }
+        }
+    }
+)
+async def parse_pdf(request: Request):
     """解析PDF文檔"""
     try:
-        # 驗證文件類型
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="僅支持PDF文件")
-
-        # 檢查文件大小
-        content = await file.read()
-        if len(content) > settings.MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="文件過大")
-
-        logger.info(f"開始解析PDF文件: {file.filename}")
-
-        # 解析PDF
-        result = await pdf_parser.parse_pdf(content, language)
+        # 邊接收邊寫入臨時文件並計算摘要；文件頭魔數不符或超過大小限制即中止
+        hasher = hashlib.blake2b(digest_size=16)
+        async with stream_multipart_to_disk(request, file_field="file", kind="pdf", hasher=hasher) as form:
+            language = form.fields.get("language", "auto")
+            logger.info(f"開始解析PDF文件: {form.filename}")
+
+            # 解析PDF；重複提交的文檔直接命中緩存（與綜合分析流水線共用）
+            cache_key = (hasher.hexdigest(), language)
+            result = PDF_CACHE.get(cache_key)
+            if result is None:
+                result = await run_in_pool(parse_pdf_sync, form.path, language)
+                PDF_CACHE[cache_key] = result
 
         return PDFParseResponse(
             success=True,
-            filename=file.filename,
+            filename=form.filename,
             language=result['detected_language'],
             page_count=result['page_count'],
             extraction_method=result['extraction_method'],
@@ -50,6 +72,8 @@ async def parse_pdf(
             structure=result['structure']
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"PDF解析失敗: {str(e)}")
         raise HTTPException(status_code=500, detail=f"PDF解析失敗: {str(e)}")
@@ -67,18 +91,16 @@ async def analyze_chemistry(
 
         image_data = None
         if image:
-            if not any(image.filename.lower().endswith(ext) 
-                      for ext in ['.png', '.jpg', '.jpeg']):
-                raise HTTPException(status_code=400, detail="僅支持PNG/JPG圖像")
+            # 先讀取文件頭，按魔數驗證PNG/JPG後再讀取其餘內容
+            head = await image.read(SNIFF_BYTES)
+            if not sniff(head, "image"):
+                raise HTTPException(status_code=415, detail="僅支持PNG/JPG圖像")
 
-            image_data = await image.read()
+            image_data = head + await image.read()
 
         logger.info("開始化學結構分析")
 
-        result = await chem_analyzer.analyze_chemical_structure(
-            image_data=image_data,
-            text=text
-        )
+        result = await run_in_pool(analyze_chemical_structure_sync, image_data, text)
 
         return ChemicalAnalysisResponse(
             success=True,
@@ -91,6 +113,8 @@ async def analyze_chemistry(
             similarity_analysis=result['similarity_analysis']
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"化學結構分析失敗: {str(e)}")
         raise HTTPException(status_code=500, detail=f"化學結構分析失敗: {str(e)}")
@@ -105,13 +129,14 @@ async def analyze_patent_claims(
     try:
         logger.info("開始專利權利要求分析")
 
-        result = await patent_analyzer.analyze_patent_claims(text, language)
+        result = await run_in_pool(analyze_patent_claims_sync, text, language)
 
         return PatentClaimsAnalysisResponse(
             success=True,
             total_claims=result['total_claims'],
             language=result['language'],
-            claims=result['claims'],
+            # 內部服務產出的可信數據，跳過逐項校驗
+            claims=[PatentClaim.model_construct(**claim) for claim in result['claims']],
             structure_analysis=result['structure_analysis'],
             dependency_tree=result['dependency_tree'],
             technical_features=result['technical_features'],
@@ -133,25 +158,35 @@ async def calculate_molecular_properties(
 ):
     """計算分子性質"""
     try:
-        if len(smiles_list) > settings.MAX_MOLECULES_PER_REQUEST:
+        if len(smiles_list) > _MAX_MOL:
             raise HTTPException(
                 status_code=400, 
-                detail=f"一次最多處理{settings.MAX_MOLECULES_PER_REQUEST}個分子"
+                detail=f"一次最多處理{_MAX_MOL}個分子"
             )
 
         logger.info(f"開始計算{len(smiles_list)}個分子的性質")
 
-        result = await molecular_calculator.calculate_all_properties(smiles_list)
+        # 與併發請求合併批量計算；已計算過的分子由工作進程按規範SMILES緩存直接返回
+        molecules = await property_batcher.submit(smiles_list)
+
+        # 單獨生成本請求的摘要
+        result = await run_in_pool(
+            summarize_molecules_sync,
+            [m for m in molecules if m is not None]
+        )
 
         return MolecularPropertiesResponse(
             success=True,
             molecules_count=len(result['molecules']),
-            molecules=result['molecules'],
+            # 內部服務產出的可信數據，跳過逐項校驗
+            molecules=[MoleculeProperties.model_construct(**m) for m in result['molecules']],
             properties_summary=result['properties_summary'],
             comparisons=result['comparisons'],
             visualizations=result['visualizations']
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"分子性質計算失敗: {str(e)}")
         raise HTTPException(status_code=500, detail=f"分子性質計算失敗: {str(e)}")
@@ -161,18 +196,14 @@ async def calculate_molecular_properties(
 async def generate_molecule_image(smiles: str, width: int = 300, height: int = 300):
     """生成分子結構圖"""
     try:
-        image_data = await chem_analyzer.generate_molecule_image(smiles, (width, height))
-
-        # 創建臨時文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-            temp_file.write(image_data)
-            temp_path = temp_file.name
+        # 渲染為CPU計算，放到線程中執行；圖像緩存保留在本進程
+        image_data = await asyncio.to_thread(chem_analyzer.generate_molecule_image, smiles, (width, height))
 
-        return FileResponse(
-            temp_path,
+        # 直接從內存返回，無需臨時文件
+        return Response(
+            content=image_data,
             media_type="image/png",
-            filename=f"molecule_{smiles[:10]}.png",
-            background=BackgroundTasks([lambda: os.unlink(temp_path)])
+            headers={"Content-Disposition": f'inline; filename="molecule_{smiles[:10]}.png"'}
         )
 
     except Exception as e:
@@ -191,51 +222,22 @@ async def comprehensive_analysis(
     try:
         logger.info(f"開始綜合分析: {pdf_file.filename}")
 
-        # 1. PDF解析
-        content = await pdf_file.read()
-        pdf_result = await pdf_parser.parse_pdf(content, language)
-
-        # 提取全文
-        full_text = ""
-        for page in pdf_result['text_content']['pages']:
-            full_text += page.get('text', '') + "\n"
+        # 上傳、解析、分析三個階段由流水線分別處理
+        result = await comprehensive_pipeline.submit(
+            pdf_file, language, include_molecular_analysis, include_patent_analysis
+        )
 
         response = ComprehensiveAnalysisResponse(
             success=True,
             filename=pdf_file.filename,
-            pdf_analysis=pdf_result
+            **result
         )
 
-        # 2. 化學結構分析（如果請求）
-        if include_molecular_analysis:
-            try:
-                chem_result = await chem_analyzer.analyze_chemical_structure(text=full_text)
-                response.chemical_analysis = chem_result
-
-                # 如果找到SMILES，計算分子性質
-                if chem_result['smiles']:
-                    mol_props = await molecular_calculator.calculate_all_properties(
-                        chem_result['smiles'][:10]  # 限制數量
-                    )
-                    response.molecular_properties = mol_props
-
-            except Exception as e:
-                logger.warning(f"化學分析失敗: {str(e)}")
-
-        # 3. 專利權利要求分析（如果請求）
-        if include_patent_analysis:
-            try:
-                patent_result = await patent_analyzer.analyze_patent_claims(
-                    full_text, pdf_result['detected_language']
-                )
-                response.patent_analysis = patent_result
-
-            except Exception as e:
-                logger.warning(f"專利分析失敗: {str(e)}")
-
         logger.success("綜合分析完成")
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"綜合分析失敗: {str(e)}")
         raise HTTPException(status_code=500, detail=f"綜合分析失敗: {str(e)}")
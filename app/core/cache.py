@@ -0,0 +1,13 @@
+
+from cachetools import LRUCache, TTLCache
+
+from app.core.config import settings
+
+# 分子描述符緩存，鍵為(類別, 規範SMILES)
+DESC_CACHE: LRUCache = LRUCache(maxsize=50_000)
+
+# 分子圖像緩存，鍵為(規範SMILES, 寬, 高)
+IMG_CACHE: LRUCache = LRUCache(maxsize=5_000)
+
+# PDF分析結果緩存，鍵為(文件摘要, 語言)，子分析結果鍵為(鍵, 階段)
+PDF_CACHE: TTLCache = TTLCache(maxsize=settings.PDF_CACHE_SIZE, ttl=settings.PDF_CACHE_TTL)
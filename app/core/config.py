@@ -1,5 +1,5 @@
 
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import List
 import os
 
@@ -26,15 +26,34 @@ class Settings(BaseSettings):
     # 處理設置
     MAX_CONCURRENT_TASKS: int = 5
     TASK_TIMEOUT: int = 300  # 5分鐘
+    PIN_WORKER_CPUS: bool = False  # 進程池工作進程各綁定一個CPU核心（會限制任務內的線程與numba並行，僅適用於單個uvicorn工作進程且任務不需多核的部署）
 
     # OCR設置
     TESSERACT_CONFIG: str = "--psm 6"
     OCR_LANGUAGES: str = "chi_sim+chi_tra+eng+jpn"
+    OCR_MAX_WORKERS: int = 8  # 單個文檔並行識別的最大頁數
+    OCR_DPI: int = 300  # 光柵化分辨率；二值化後的小字號文本低於300dpi時識別率明顯下降
 
     # 化學分析設置
     MAX_MOLECULES_PER_REQUEST: int = 100
     SIMILARITY_THRESHOLD: float = 0.8
 
+    # 分子性質批處理設置
+    BATCH_MAX_MOLECULES: int = 200  # 隊列中累積到該數量即刷新
+    BATCH_FLUSH_MS: int = 20  # 最長等待時間（毫秒）
+
+    # 綜合分析流水線設置
+    PIPELINE_BATCH_SIZE: int = 8  # 分析階段每批最多任務數
+    PIPELINE_FLUSH_MS: int = 50  # 分析階段最長等待時間（毫秒）
+
+    # 專利分析設置
+    SPACY_BATCH_SIZE: int = 64  # nlp.pipe每批處理的權利要求數
+    SPACY_MAX_LENGTH: int = 2_000_000  # 單條權利要求送入spaCy的最大字符數
+
+    # PDF解析結果緩存設置
+    PDF_CACHE_SIZE: int = 128
+    PDF_CACHE_TTL: int = 3600  # 1小時
+
     # 日誌設置
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "{time} | {level} | {message}"
@@ -45,9 +64,8 @@ class Settings(BaseSettings):
     # Redis設置（可選）
     REDIS_URL: str = None
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    # 設置在啟動後不可修改，模塊級緩存的配置值因此始終有效
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, frozen=True)
 
 # 創建設置實例
 settings = Settings()
@@ -0,0 +1,87 @@
+
+import asyncio
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from loguru import logger
+from app.core.config import settings
+
+# 全局進程池（按需創建）
+_pool: Optional[ProcessPoolExecutor] = None
+
+# 當前進程是否為進程池工作進程
+_in_worker = False
+
+# 工作進程啟動時預先導入的模塊（多數模塊導入時會創建全局分析器實例；專利分析器及其spaCy模型按需加載）
+_WARM_MODULES = (
+    "fitz",
+    "rdkit.Chem",
+    "rdkit.Chem.AllChem",
+    "rdkit.Chem.Draw",
+    "app.services.pdf_parser",
+    "app.services.chemical_analyzer",
+    "app.services.patent_analyzer",
+    "app.services.molecular_visualizer",
+)
+
+def _pin_worker(counter):
+    """按啟動順序將工作進程輪流綁定到可用CPU核心，減少進程間爭用與遷移抖動"""
+    if not hasattr(os, "sched_setaffinity"):
+        return
+
+    with counter.get_lock():
+        worker_id = counter.value
+        counter.value += 1
+
+    cpus = sorted(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, {cpus[worker_id % len(cpus)]})
+
+def _init_worker(counter=None):
+    """工作進程初始化：預先加載PDF/OCR/RDKit/spaCy等工具鏈，常駐於進程中供後續任務復用"""
+    global _in_worker
+    _in_worker = True
+
+    if counter is not None:
+        _pin_worker(counter)
+
+    for module in _WARM_MODULES:
+        importlib.import_module(module)
+
+    logger.debug(f"工作進程{os.getpid()}已預熱")
+
+def start_pool() -> ProcessPoolExecutor:
+    """創建（或返回已有的）全局進程池"""
+    global _pool
+    if _pool is None:
+        counter = multiprocessing.Value("i", 0) if settings.PIN_WORKER_CPUS else None
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.MAX_CONCURRENT_TASKS,
+            initializer=_init_worker,
+            initargs=(counter,)
+        )
+        logger.info(f"進程池已啟動，工作進程數: {settings.MAX_CONCURRENT_TASKS}")
+    return _pool
+
+def shutdown_pool():
+    """關閉全局進程池"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        logger.info("進程池已關閉")
+
+async def run_in_pool(fn: Callable[..., Any], *args) -> Any:
+    """
+    在進程池中執行CPU密集型的同步函數，避免阻塞事件循環
+
+    fn必須是模塊級函數（可被pickle）。在工作進程內部調用時直接執行，
+    避免嵌套創建進程池。
+    """
+    if _in_worker:
+        return fn(*args)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(start_pool(), fn, *args)
@@ -8,12 +8,13 @@ def setup_logging():
     # 清除默認處理器
     logger.remove()
 
-    # 添加控制台處理器
+    # 添加控制台處理器（enqueue=True由後台線程寫出，不阻塞事件循環；非終端輸出時不著色）
     logger.add(
         sys.stdout,
         format=settings.LOG_FORMAT,
         level=settings.LOG_LEVEL,
-        colorize=True
+        colorize=sys.stdout.isatty(),
+        enqueue=True
     )
 
     # 添加文件處理器（如果在生產環境）
@@ -24,7 +25,8 @@ def setup_logging():
             level=settings.LOG_LEVEL,
             rotation="1 day",
             retention="30 days",
-            compression="zip"
+            compression="zip",
+            enqueue=True
         )
 
     logger.info(f"日誌系統已初始化，級別: {settings.LOG_LEVEL}")
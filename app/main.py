@@ -1,26 +1,39 @@
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse
 import uvicorn
 import os
+import hashlib
+import orjson
+from loguru import logger
 from pathlib import Path
 
 from app.api import endpoints
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.core.executor import start_pool, shutdown_pool
+from app.services.property_batcher import property_batcher
+from app.pipeline import comprehensive_pipeline
 
 # 設置日誌
 setup_logging()
 
+class NumpyORJSONResponse(ORJSONResponse):
+    """orjson序列化響應，可直接輸出numpy數組和標量；與json一致接受非字符串的字典鍵"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
 # 創建FastAPI應用
 app = FastAPI(
     title="ChemPatent Pro",
     description="化學專利分析系統 - 專業的化學專利文檔解析、分析和可視化平台",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=NumpyORJSONResponse
 )
 
 # CORS設置
@@ -40,6 +53,22 @@ if static_dir.exists():
 # 包含路由
 app.include_router(endpoints.router, prefix="/api/v1")
 
+# 啟動時創建進程池，承載CPU密集型分析任務
+@app.on_event("startup")
+async def startup_event():
+    start_pool()
+    property_batcher.start()
+    comprehensive_pipeline.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await comprehensive_pipeline.stop()
+    await property_batcher.stop()
+    shutdown_pool()
+
+    # 寫出日誌隊列中剩餘的記錄
+    await logger.complete()
+
 # 健康檢查端點
 @app.get("/health")
 async def health_check():
@@ -49,15 +78,8 @@ async def health_check():
         "version": "1.0.0"
     }
 
-# 根路由 - 服務前端
-@app.get("/", response_class=HTMLResponse)
-async def read_root():
-    template_path = Path(__file__).parent / "frontend" / "templates" / "index.html"
-    if template_path.exists():
-        with open(template_path, "r", encoding="utf-8") as f:
-            return f.read()
-    else:
-        return HTMLResponse(content='''
+# 首頁內容在導入時讀取一次，避免每次請求重複讀盤
+_FALLBACK_HTML = '''
         <!DOCTYPE html>
         <html>
         <head>
@@ -103,12 +125,29 @@ async def read_root():
             </div>
         </body>
         </html>
-        ''')
+        '''
+
+_template_path = Path(__file__).parent / "frontend" / "templates" / "index.html"
+_INDEX_HTML = _template_path.read_bytes() if _template_path.exists() else _FALLBACK_HTML.encode("utf-8")
+_INDEX_HEADERS = {
+    "ETag": f'"{hashlib.blake2b(_INDEX_HTML, digest_size=16).hexdigest()}"',
+    "Cache-Control": "public, max-age=3600"
+}
+
+# 根路由 - 服務前端
+@app.get("/", response_class=HTMLResponse)
+async def read_root(request: Request):
+    if request.headers.get("if-none-match") == _INDEX_HEADERS["ETag"]:
+        return Response(status_code=304, headers=_INDEX_HEADERS)
+    return HTMLResponse(content=_INDEX_HTML, headers=_INDEX_HEADERS)
 
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", 8000)),
-        reload=False
+        reload=False,
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
+        loop="auto",  # 安裝uvloop時自動使用
+        http="auto"   # 安裝httptools時自動使用
     )
@@ -58,7 +58,7 @@ class MoleculeProperties(BaseModel):
     physicochemical_properties: Dict[str, Any]
     drug_like_properties: Dict[str, Any]
     admet_properties: Dict[str, Any]
-    fingerprints: Dict[str, Any]
+    fingerprints: Dict[str, Any]  # morgan_fp/maccs_fp為按位打包（高位在前）後的base64字符串
 
 class MolecularPropertiesResponse(BaseResponse):
     molecules_count: int
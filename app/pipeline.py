@@ -0,0 +1,276 @@
+
+import asyncio
+import hashlib
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from fastapi import UploadFile
+from loguru import logger
+
+from app.core.cache import PDF_CACHE
+from app.core.config import settings
+from app.core.executor import run_in_pool
+from app.services.pdf_parser import parse_pdf_sync
+from app.services.chemical_analyzer import analyze_chemical_structure_sync
+from app.services.patent_analyzer import analyze_patent_claims_sync
+from app.services.molecular_visualizer import molecular_calculator, summarize_molecules_sync
+from app.utils.upload import stream_upload_to_disk
+
+@dataclass
+class PipelineJob:
+    """綜合分析任務，在各階段之間傳遞"""
+    upload: UploadFile
+    language: str
+    include_molecular_analysis: bool
+    include_patent_analysis: bool
+    future: asyncio.Future
+    resources: AsyncExitStack = field(default_factory=AsyncExitStack)
+    pdf_path: Optional[str] = None
+    cache_key: Optional[tuple] = None
+    pdf_result: Optional[Dict] = None
+    full_text: str = ""
+
+_STOPPED = "綜合分析流水線已停止"
+
+async def _fail(job: PipelineJob, error: Exception):
+    """釋放任務資源並將異常傳回請求方"""
+    await job.resources.aclose()
+    if not job.future.done():
+        job.future.set_exception(error)
+
+async def stage_1(in_q: asyncio.Queue, out_q: asyncio.Queue):
+    """階段1：分塊接收上傳文件並計算摘要"""
+    while True:
+        job: PipelineJob = await in_q.get()
+        try:
+            hasher = hashlib.blake2b(digest_size=16)
+            job.pdf_path = await job.resources.enter_async_context(
+                stream_upload_to_disk(job.upload, hasher=hasher, kind="pdf")
+            )
+            job.cache_key = (hasher.hexdigest(), job.language)
+        except Exception as e:
+            await _fail(job, e)
+            continue
+        await out_q.put(job)
+
+async def stage_2(in_q: asyncio.Queue, out_q: asyncio.Queue):
+    """階段2：PDF解析（重複提交的文檔直接命中緩存）"""
+    while True:
+        job: PipelineJob = await in_q.get()
+        try:
+            pdf_result = PDF_CACHE.get(job.cache_key)
+            if pdf_result is None:
+                pdf_result = await run_in_pool(parse_pdf_sync, job.pdf_path, job.language)
+                PDF_CACHE[job.cache_key] = pdf_result
+
+            job.pdf_result = pdf_result
+
+            # 提取全文（一次性拼接，避免逐頁累加的二次複製）
+            job.full_text = "\n".join(
+                page.get('text', '') for page in pdf_result['text_content']['pages']
+            )
+
+            # 解析完成後即可刪除臨時文件
+            await job.resources.aclose()
+        except Exception as e:
+            await _fail(job, e)
+            continue
+        await out_q.put(job)
+
+async def stage_3(in_q: asyncio.Queue, flushes: Dict[asyncio.Task, List[PipelineJob]]):
+    """
+    階段3：按數量或時間閾值收集任務，批量執行化學與專利分析
+
+    Args:
+        in_q: 待分析任務隊列
+        flushes: 進行中的批量分析任務及其任務批次，由流水線持有，停止時統一取消
+    """
+    loop = asyncio.get_running_loop()
+    flush_interval = settings.PIPELINE_FLUSH_MS / 1000
+
+    while True:
+        batch = [await in_q.get()]
+        deadline = loop.time() + flush_interval
+
+        try:
+            while len(batch) < settings.PIPELINE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(in_q.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # 已從隊列取出但尚未分發的任務不會再被處理
+            for job in batch:
+                await _fail(job, RuntimeError(_STOPPED))
+            raise
+
+        # 分析在獨立任務中進行，不阻塞下一批的收集
+        task = asyncio.create_task(_analyze_batch(batch))
+        flushes[task] = batch
+        task.add_done_callback(lambda done: flushes.pop(done, None))
+
+async def _analyze_batch(batch: List[PipelineJob]):
+    """並行分析一批任務"""
+    await asyncio.gather(*(_analyze_job(job) for job in batch))
+
+async def _analyze_job(job: PipelineJob):
+    """化學結構分析與專利權利要求分析相互獨立，並行執行"""
+    try:
+        result = await _analyze(job)
+    except Exception as e:
+        # 分析在獨立任務中執行，任何異常都必須回傳給請求方，否則請求會一直等待
+        await _fail(job, e)
+        return
+
+    if not job.future.done():
+        job.future.set_result(result)
+
+async def _analyze(job: PipelineJob) -> Dict[str, Any]:
+    """執行單個任務的分析，返回綜合分析結果"""
+    result = {
+        'pdf_analysis': job.pdf_result,
+        'chemical_analysis': None,
+        'molecular_properties': None,
+        'patent_analysis': None
+    }
+
+    tasks = {}
+    if job.include_molecular_analysis:
+        tasks["化學"] = _chem_pipeline(job.cache_key, job.full_text)
+    if job.include_patent_analysis:
+        tasks["專利"] = _patent_pipeline(
+            job.cache_key, job.full_text, job.pdf_result['detected_language']
+        )
+
+    outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    for name, outcome in zip(tasks, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning(f"{name}分析失敗: {str(outcome)}")
+        elif name == "化學":
+            result['chemical_analysis'], result['molecular_properties'] = outcome
+        else:
+            result['patent_analysis'] = outcome
+
+    return result
+
+async def _chem_pipeline(cache_key: tuple, full_text: str) -> tuple:
+    """化學結構分析及分子性質計算，返回(化學分析, 分子性質)"""
+    cached = PDF_CACHE.get((cache_key, "chem"))
+    if cached is not None:
+        return cached
+
+    chem_result = await run_in_pool(analyze_chemical_structure_sync, None, full_text)
+    mol_props = None
+
+    # 如果找到SMILES，計算分子性質（逐分子在進程池中並行），再單獨生成摘要
+    if chem_result['smiles']:
+        try:
+            molecules = await molecular_calculator.calculate_molecules(
+                chem_result['smiles'][:10]  # 限制數量
+            )
+            mol_props = await run_in_pool(
+                summarize_molecules_sync,
+                [m for m in molecules if m is not None]
+            )
+        except Exception as e:
+            # 分子性質失敗不影響已完成的化學分析；不完整的結果不寫入緩存
+            logger.warning(f"分子性質計算失敗: {str(e)}")
+            return chem_result, None
+
+    PDF_CACHE[(cache_key, "chem")] = (chem_result, mol_props)
+    return chem_result, mol_props
+
+async def _patent_pipeline(cache_key: tuple, full_text: str, language: str) -> Dict:
+    """專利權利要求分析"""
+    cached = PDF_CACHE.get((cache_key, "patent"))
+    if cached is not None:
+        return cached
+
+    patent_result = await run_in_pool(analyze_patent_claims_sync, full_text, language)
+    PDF_CACHE[(cache_key, "patent")] = patent_result
+    return patent_result
+
+class ComprehensivePipeline:
+    """三階段綜合分析流水線，階段之間以有界隊列銜接並提供背壓"""
+
+    def __init__(self, workers_per_stage: int, queue_size: int):
+        self.workers_per_stage = workers_per_stage
+        self.queue_size = queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self._flushes: Dict[asyncio.Task, List[PipelineJob]] = {}
+
+    def start(self):
+        """啟動各階段工作協程（需在事件循環中調用）"""
+        loop = asyncio.get_running_loop()
+        if self._workers and self._loop is loop:
+            return
+
+        self._loop = loop
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(3)]
+        upload_q, parse_q, analyze_q = self._queues
+
+        # 上傳與解析階段各啟動多個協程，分析階段由單個協程按批分發
+        self._workers = [
+            *(loop.create_task(stage_1(upload_q, parse_q)) for _ in range(self.workers_per_stage)),
+            *(loop.create_task(stage_2(parse_q, analyze_q)) for _ in range(self.workers_per_stage)),
+            loop.create_task(stage_3(analyze_q, self._flushes))
+        ]
+
+    async def stop(self):
+        """停止流水線，並中止未完成的任務"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        # 分析階段已分發的批次在獨立任務中運行，同樣取消並等待其結束，未完成的任務回傳異常
+        flushes = dict(self._flushes)
+        for flush in flushes:
+            flush.cancel()
+        await asyncio.gather(*flushes, return_exceptions=True)
+        self._flushes.clear()
+
+        for batch in flushes.values():
+            for job in batch:
+                await _fail(job, RuntimeError(_STOPPED))
+
+        for queue in self._queues:
+            while not queue.empty():
+                await _fail(queue.get_nowait(), RuntimeError(_STOPPED))
+
+    async def submit(
+        self,
+        upload: UploadFile,
+        language: str,
+        include_molecular_analysis: bool,
+        include_patent_analysis: bool
+    ) -> Dict[str, Any]:
+        """
+        提交綜合分析任務並等待完成
+
+        Returns:
+            包含pdf_analysis、chemical_analysis、molecular_properties、patent_analysis的字典
+        """
+        self.start()
+        job = PipelineJob(
+            upload=upload,
+            language=language,
+            include_molecular_analysis=include_molecular_analysis,
+            include_patent_analysis=include_patent_analysis,
+            future=asyncio.get_running_loop().create_future()
+        )
+        await self._queues[0].put(job)
+        return await job.future
+
+# 創建全局實例
+comprehensive_pipeline = ComprehensivePipeline(
+    workers_per_stage=settings.MAX_CONCURRENT_TASKS,
+    queue_size=settings.MAX_CONCURRENT_TASKS * 2
+)
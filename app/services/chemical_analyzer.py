@@ -1,20 +1,185 @@
 
+import asyncio
 import cv2
 import numpy as np
-from PIL import Image
-import base64
-import io
 from typing import List, Dict, Optional, Tuple, Any
 from rdkit import Chem
-from rdkit.Chem import rdMolDescriptors, rdDepictor, Draw, AllChem
-from rdkit.Chem.Draw import rdMolDraw2D
-import matplotlib.pyplot as plt
+from rdkit.Chem import rdMolDescriptors, rdDepictor
+import os
 import re
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from cachetools import cached
 from loguru import logger
 
+from app.core.cache import DESC_CACHE, IMG_CACHE
+from app.core.executor import run_in_pool
+from app.utils.fingerprints import morgan_fingerprints, pack_fingerprints, tanimoto_matrix
+
+# 預編譯的文本掃描正則（模塊加載時構建一次）
+# SMILES詞元：僅由原子、括號原子、鍵與環閉合符號組成的完整詞元，一次線性掃描直接切分；
+# 佔有量詞不回溯，詞元後緊跟字母數字時整段放棄，而非截斷出無效片段
+_SMILES_TOKEN_RE = re.compile(
+    r'(?<![A-Za-z0-9])'
+    r'(?:Br|Cl|[BCNOPSFIcnops]|\[[^\]\s]{1,20}\]|[()=#@+\-/\\]|[1-9])++'
+    r'(?![A-Za-z0-9])'
+)
+
+# 元素符號（雙字母在前，保證分支按最長符號匹配）
+_ELEMENTS = sorted((
+    'H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn '
+    'Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce '
+    'Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi Po At Rn '
+    'Fr Ra Ac Th Pa U Np Pu Am Cm Bk Cf Es Fm Md No Lr'
+).split(), key=len, reverse=True)
+
+# 分子式：至少兩個元素符號（可帶計數）組成的獨立詞，排除普通大寫單詞
+_MOLECULAR_FORMULA_RE = re.compile(
+    r'(?<![A-Za-z0-9])(?:(?:' + '|'.join(_ELEMENTS) + r')\d*){2,}(?![A-Za-z0-9])'
+)
+
+# 常見化學後綴（烷、烯、炔、醇、醛、酮、羧酸、酯、鹽），合併為一個分支正則
+_CHEMICAL_SUFFIX_RE = re.compile(r'\w+(?:ane|ene|yne|ol|al|one|ic acid|ate|ide)\b', re.IGNORECASE)
+
+# 常見化學前綴，合併為一個分支正則
+_CHEMICAL_PREFIX_RE = re.compile(
+    r'\b(?:meth|eth|prop|but|pent|hex|hept|oct|non|dec)yl\w*'
+    r'|\b(?:phenyl|benzyl|tolyl)\w*'
+    r'|\b(?:hydroxy|amino|nitro|sulfo|phospho)\w*',
+    re.IGNORECASE
+)
+
+# 特徵檢測前圖像長邊的上限（像素）
+_FEATURE_MAX_SIDE = 1024
+
+# 邊緣像素佔比低於此值的圖像（空白頁、淡掃描）不可能包含結構式，直接跳過霍夫檢測
+_MIN_EDGE_DENSITY = 0.001
+
+# 啟用OpenCV的優化內核（IPP/SIMD），內部並行線程數取可用核心數的一半
+cv2.setUseOptimized(True)
+_available_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+cv2.setNumThreads(max(1, _available_cpus // 2))
+
+# 特徵檢測線程池（按需創建，進程內各次檢測共用，避免每張圖像創建並銷毀線程）
+_feature_pool: Optional[ThreadPoolExecutor] = None
+_feature_pool_lock = threading.Lock()
+
+def _get_feature_pool() -> ThreadPoolExecutor:
+    """創建（或返回已有的）特徵檢測線程池"""
+    global _feature_pool
+    if _feature_pool is None:
+        with _feature_pool_lock:
+            if _feature_pool is None:
+                _feature_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="features")
+    return _feature_pool
+
+# 各線程獨立的圖像緩衝區，同尺寸圖像之間復用，避免逐次分配
+_scratch_buffers = threading.local()
+
+def _scratch(name: str, shape: Tuple[int, int]) -> np.ndarray:
+    """返回當前線程中指定名稱的uint8緩衝區，形狀變化時重新分配"""
+    buffers = getattr(_scratch_buffers, "arrays", None)
+    if buffers is None:
+        buffers = _scratch_buffers.arrays = {}
+
+    buf = buffers.get(name)
+    if buf is None or buf.shape != shape:
+        buf = buffers[name] = np.empty(shape, dtype=np.uint8)
+    return buf
+
+def _detect_bonds(edges: np.ndarray, scale: float) -> Optional[np.ndarray]:
+    """在邊緣圖上檢測直線（化學鍵），投票與長度閾值隨圖像尺寸提高，抑制大圖上的噪聲線段"""
+    short_side = min(edges.shape)
+    return cv2.HoughLinesP(
+        edges, 1, np.pi/180, threshold=max(50, int(short_side * 0.05)),
+        minLineLength=max(round(10 * scale), short_side // 40), maxLineGap=max(1, round(5 * scale))
+    )
+
+def _detect_rings(gray: np.ndarray, scale: float) -> Optional[np.ndarray]:
+    """
+    檢測圓形（dp=2將累加器分辨率減半，投票更快；圓心最小間距隨圖像尺寸增大）
+
+    縮小後圓周上的邊緣點數按比例減少，累加器閾值param2同樣按縮放比例降低（下限10），
+    否則縮小後的小環得票不足而漏檢。
+    """
+    return cv2.HoughCircles(
+        gray, cv2.HOUGH_GRADIENT, 2, max(20 * scale, min(gray.shape) // 20),
+        param1=50, param2=max(10, round(30 * scale)),
+        minRadius=max(1, round(5 * scale)), maxRadius=max(2, round(50 * scale))
+    )
+
+def _detect_text_regions(edges: np.ndarray, scale: float) -> int:
+    """統計面積適合文字的邊緣連通域數（面積閾值按縮放比例的平方調整）"""
+    _, _, stats, _ = cv2.connectedComponentsWithStats(edges, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]  # 跳過背景標籤0
+    area_scale = scale * scale
+    return int(((areas > 10 * area_scale) & (areas < 1000 * area_scale)).sum())
+
+@functools.lru_cache(maxsize=4096)
+def _mol_from_smiles_cached(smiles: str) -> Optional[Chem.Mol]:
+    """解析SMILES（按字符串緩存；返回的Mol為共享對象，調用方不得修改）"""
+    return Chem.MolFromSmiles(smiles)
+
+@functools.lru_cache(maxsize=4096)
+def _canonical_molecule(smiles: str) -> Optional[Tuple[str, Chem.Mol]]:
+    """解析並規範化SMILES（按原始字符串緩存），無效時返回None；規範SMILES同時用作各緩存的鍵"""
+    mol = _mol_from_smiles_cached(smiles)
+    if mol is None:
+        return None
+    return Chem.MolToSmiles(mol), mol
+
+# 2D佈局使用CoordGen（佈局質量更好；座標按分子緩存，只計算一次）
+rdDepictor.SetPreferCoordGen(True)
+
+@functools.lru_cache(maxsize=1024)
+def _depicted_mol(smiles: str) -> Optional[Chem.Mol]:
+    """帶2D座標的分子（按SMILES緩存，同一分子的不同尺寸共用座標）"""
+    parsed = _mol_from_smiles_cached(smiles)
+    if parsed is None:
+        return None
+
+    # 複製後再添加座標，不修改共享的解析結果
+    mol = Chem.Mol(parsed)
+    if mol.GetNumConformers() == 0:
+        rdDepictor.Compute2DCoords(mol)
+    return mol
+
+@cached(IMG_CACHE)
+def _render_molecule_png(smiles: str, width: int, height: int) -> bytes:
+    """渲染分子結構PNG（按SMILES和尺寸緩存）"""
+    # 繪圖模塊依賴Cairo，僅在首次渲染時導入
+    from rdkit.Chem.Draw import rdMolDraw2D
+
+    mol = _depicted_mol(smiles)
+    if mol is None:
+        raise ValueError(f"無效的SMILES: {smiles}")
+
+    # 創建分子圖像
+    drawer = rdMolDraw2D.MolDraw2DCairo(width, height)
+    drawer.DrawMolecule(mol)
+    drawer.FinishDrawing()
+
+    # 轉換為bytes
+    return drawer.GetDrawingText()
+
+def _precompute_structure(smiles: str) -> Tuple[str, Chem.Mol]:
+    """預先解析並規範化固定的SMILES，返回(規範SMILES, 分子對象)"""
+    mol = Chem.MolFromSmiles(smiles)
+    return Chem.MolToSmiles(mol), mol
+
 class ChemicalStructureAnalyzer:
     """化學結構識別和SMILES轉換分析器"""
 
+    # 圖像特徵推斷使用的示例結構，導入時解析一次
+    _INFERRED = {
+        'ring1': _precompute_structure('C1CCCCC1'),    # 環己烷
+        'aromatic': _precompute_structure('c1ccccc1'), # 苯環
+        'chain6': _precompute_structure('CCCCCC')      # 己烷
+    }
+    # 規範SMILES -> 分子對象，驗證時直接命中
+    _INFERRED_MOLS = dict(_INFERRED.values())
+
     def __init__(self):
         self.common_functional_groups = {
             'hydroxyl': r'-OH|OH',
@@ -34,6 +199,17 @@ class ChemicalStructureAnalyzer:
             'phosphate': r'-PO4|PO4'
         }
 
+        # 各官能團的正則預先編譯；模式相同的官能團（如carbonyl與ketone）共用第一個名稱的正則，只檢測一次。
+        # 官能團之間可以重疊（如COOH同時含OH），不能合併為一個交替式單次掃描
+        self._functional_group_alias = {}
+        self._functional_group_res = {}
+        patterns = {}
+        for name, pattern in self.common_functional_groups.items():
+            first = patterns.setdefault(pattern, name)
+            if first == name:
+                self._functional_group_res[name] = re.compile(pattern, re.IGNORECASE)
+            self._functional_group_alias[name] = first
+
     async def analyze_chemical_structure(self, image_data: bytes = None, text: str = None) -> Dict:
         """
         分析化學結構
@@ -45,6 +221,26 @@ class ChemicalStructureAnalyzer:
         Returns:
             分析結果字典
         """
+        # 分析過程均為CPU計算，放到線程中執行，不阻塞事件循環
+        return await asyncio.to_thread(self._run_pipeline, image_data, text)
+
+    async def analyze_batch(self, items: List[Tuple[Optional[bytes], Optional[str]]]) -> List[Dict]:
+        """
+        批量分析化學結構（如多頁專利逐頁分析），各項分散到進程池並行執行
+
+        Args:
+            items: (圖像數據, 文本)元組列表；跨進程只傳遞原始數據，不傳遞Mol對象
+
+        Returns:
+            與items順序一致的分析結果列表
+        """
+        return await asyncio.gather(*(
+            run_in_pool(analyze_chemical_structure_sync, image_data, text)
+            for image_data, text in items
+        ))
+
+    def _run_pipeline(self, image_data: bytes = None, text: str = None) -> Dict:
+        """同步執行完整的化學結構分析流程"""
         try:
             result = {
                 'molecules': [],
@@ -57,28 +253,29 @@ class ChemicalStructureAnalyzer:
 
             # 從文本中提取化學信息
             if text:
-                logger.info("從文本中提取化學信息")
-                text_analysis = await self._analyze_text_chemistry(text)
+                logger.debug("從文本中提取化學信息")
+                text_analysis = self._analyze_text_chemistry(text)
                 result.update(text_analysis)
 
             # 從圖像中識別化學結構
             if image_data:
-                logger.info("從圖像中識別化學結構")
-                image_analysis = await self._analyze_image_chemistry(image_data)
+                logger.debug("從圖像中識別化學結構")
+                image_analysis = self._analyze_image_chemistry(image_data)
 
                 # 合併結果
                 for key in ['molecules', 'smiles', 'molecular_formulas']:
                     if key in image_analysis:
                         result[key].extend(image_analysis[key])
 
-            # 驗證和清理SMILES
-            result['smiles'] = await self._validate_smiles(result['smiles'])
+            # 驗證和清理SMILES，後續步驟直接使用解析好的分子對象
+            molecules = self._validate_smiles(result['smiles'])
+            result['smiles'] = [smiles for smiles, _ in molecules]
 
             # 生成分子描述符
-            result['descriptors'] = await self._calculate_descriptors(result['smiles'])
+            result['descriptors'] = self._calculate_descriptors(molecules)
 
             # 分析分子相似性
-            result['similarity_analysis'] = await self._analyze_molecular_similarity(result['smiles'])
+            result['similarity_analysis'] = self._analyze_molecular_similarity(molecules)
 
             logger.success(f"化學結構分析完成，識別出{len(result['smiles'])}個SMILES")
             return result
@@ -87,7 +284,7 @@ class ChemicalStructureAnalyzer:
             logger.error(f"化學結構分析失敗: {str(e)}")
             raise
 
-    async def _analyze_text_chemistry(self, text: str) -> Dict:
+    def _analyze_text_chemistry(self, text: str) -> Dict:
         """從文本中提取化學信息"""
         result = {
             'molecules': [],
@@ -97,94 +294,36 @@ class ChemicalStructureAnalyzer:
             'molecular_formulas': []
         }
 
-        # 提取SMILES字符串
-        smiles_patterns = [
-            r'[A-Za-z0-9\[\]()=#@+\-\\/\\]+',  # 基本SMILES模式
-        ]
-
-        for pattern in smiles_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                if self._is_valid_smiles_pattern(match):
-                    result['smiles'].append(match)
+        # 提取SMILES字符串（按出現順序去重，重複的詞元不再進入RDKit）
+        result['smiles'] = list(dict.fromkeys(
+            token for token in _SMILES_TOKEN_RE.findall(text)
+            if len(token) >= 3 and not token.isdigit()
+        ))
 
         # 提取分子式
-        molecular_formula_patterns = [
-            r'C\d+H\d+[A-Z]?\d*[A-Z]?\d*',  # 基本分子式
-            r'[A-Z][a-z]?\d*(?:[A-Z][a-z]?\d*)*',  # 元素符號組合
-        ]
-
-        for pattern in molecular_formula_patterns:
-            matches = re.findall(pattern, text)
-            result['molecular_formulas'].extend(matches)
+        result['molecular_formulas'] = list(dict.fromkeys(_MOLECULAR_FORMULA_RE.findall(text)))
 
         # 提取化學名稱
-        chemical_names = await self._extract_chemical_names(text)
+        chemical_names = self._extract_chemical_names(text)
         result['chemical_names'].extend(chemical_names)
 
-        # 檢測官能團
-        for group_name, pattern in self.common_functional_groups.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                result['functional_groups'].append(group_name)
+        # 檢測官能團（按定義順序輸出）
+        found = {name for name, regex in self._functional_group_res.items() if regex.search(text)}
+        result['functional_groups'] = [
+            name for name, group in self._functional_group_alias.items() if group in found
+        ]
 
         return result
 
-    def _is_valid_smiles_pattern(self, candidate: str) -> bool:
-        """檢查是否為有效的SMILES模式"""
-        # 基本SMILES字符檢查
-        if len(candidate) < 3:
-            return False
-
-        # 包含SMILES常見字符
-        smiles_chars = set('CNOSPFClBrI[]()=#@+-/\\')
-        if not any(c in smiles_chars for c in candidate):
-            return False
-
-        # 不應該是純數字
-        if candidate.isdigit():
-            return False
-
-        # 不應該包含空格
-        if ' ' in candidate:
-            return False
-
-        return True
-
-    async def _extract_chemical_names(self, text: str) -> List[str]:
+    def _extract_chemical_names(self, text: str) -> List[str]:
         """提取化學名稱"""
-        chemical_names = []
-
-        # 常見化學後綴
-        chemical_suffixes = [
-            r'\w+ane\b',  # 烷烴
-            r'\w+ene\b',  # 烯烴
-            r'\w+yne\b',  # 炔烴
-            r'\w+ol\b',   # 醇類
-            r'\w+al\b',   # 醛類
-            r'\w+one\b',  # 酮類
-            r'\w+ic acid\b',  # 羧酸
-            r'\w+ate\b',  # 酯類
-            r'\w+ide\b',  # 鹽類
-        ]
-
-        for suffix_pattern in chemical_suffixes:
-            matches = re.findall(suffix_pattern, text, re.IGNORECASE)
-            chemical_names.extend(matches)
-
-        # 常見化學前綴
-        prefix_patterns = [
-            r'\b(?:meth|eth|prop|but|pent|hex|hept|oct|non|dec)yl\w*',
-            r'\b(?:phenyl|benzyl|tolyl)\w*',
-            r'\b(?:hydroxy|amino|nitro|sulfo|phospho)\w*'
-        ]
-
-        for prefix_pattern in prefix_patterns:
-            matches = re.findall(prefix_pattern, text, re.IGNORECASE)
-            chemical_names.extend(matches)
+        # 常見化學後綴與前綴各掃描一次
+        chemical_names = _CHEMICAL_SUFFIX_RE.findall(text)
+        chemical_names.extend(_CHEMICAL_PREFIX_RE.findall(text))
 
         return list(set(chemical_names))
 
-    async def _analyze_image_chemistry(self, image_data: bytes) -> Dict:
+    def _analyze_image_chemistry(self, image_data: bytes) -> Dict:
         """從圖像中分析化學結構"""
         result = {
             'molecules': [],
@@ -194,16 +333,17 @@ class ChemicalStructureAnalyzer:
         }
 
         try:
-            # 載入圖像
-            image = Image.open(io.BytesIO(image_data))
-            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            # 直接解碼為BGR數組，省去PIL中轉與通道交換
+            cv_image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if cv_image is None:
+                raise ValueError("圖像解碼失敗")
 
             # 檢測化學結構特徵
-            features = await self._detect_chemical_features(cv_image)
+            features = self._detect_chemical_features(cv_image)
             result['structure_features'] = features
 
             # 基於特徵推斷可能的化學結構
-            inferred_structures = await self._infer_structures_from_features(features)
+            inferred_structures = self._infer_structures_from_features(features)
             result.update(inferred_structures)
 
         except Exception as e:
@@ -211,47 +351,60 @@ class ChemicalStructureAnalyzer:
 
         return result
 
-    async def _detect_chemical_features(self, image: np.ndarray) -> Dict:
+    def _detect_chemical_features(self, image: np.ndarray) -> Dict:
         """檢測化學結構特徵"""
         features = {
-            'bonds': [],
-            'rings': [],
-            'atoms': [],
+            'bonds': 0,
+            'rings': 0,
+            'atoms': 0,
             'functional_groups': []
         }
 
         try:
-            # 轉為灰度圖
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-            # 邊緣檢測
-            edges = cv2.Canny(gray, 50, 150)
+            # 轉為灰度圖，長邊超過上限時先縮小（INTER_AREA），各檢測均在縮小後的圖上進行
+            # 中間結果寫入復用的緩衝區（dst參數），不再逐次分配整幅圖像
+            h, w = image.shape[:2]
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=_scratch("gray", (h, w)))
+            scale = min(1.0, _FEATURE_MAX_SIDE / max(h, w))
+            if scale < 1.0:
+                size = (max(1, round(w * scale)), max(1, round(h * scale)))
+                gray = cv2.resize(
+                    gray, size, dst=_scratch("resized", size[::-1]), interpolation=cv2.INTER_AREA
+                )
+
+            # 邊緣檢測只做一次，直線檢測與輪廓檢測共用
+            edges = cv2.Canny(gray, 50, 150, edges=_scratch("edges", gray.shape))
+
+            # 邊緣過於稀疏的圖像無需進行霍夫投票
+            if cv2.countNonZero(edges) < _MIN_EDGE_DENSITY * edges.size:
+                return features
+
+            # OpenCV在計算時釋放GIL，三項檢測並行執行
+            pool = _get_feature_pool()
+            lines = pool.submit(_detect_bonds, edges, scale)
+            circles = pool.submit(_detect_rings, gray, scale)
+            atoms = pool.submit(_detect_text_regions, edges, scale)
+
+            # 三項檢測讀取的是本線程的復用緩衝區，全部完成後才能返回（即使其中一項失敗）
+            wait((lines, circles, atoms))
 
             # 檢測直線（化學鍵）
-            lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=50, minLineLength=10, maxLineGap=5)
-            if lines is not None:
-                features['bonds'] = len(lines)
+            if lines.result() is not None:
+                features['bonds'] = len(lines.result())
 
             # 檢測圓形（可能的原子或環結構）
-            circles = cv2.HoughCircles(gray, cv2.HOUGH_GRADIENT, 1, 20, param1=50, param2=30, minRadius=5, maxRadius=50)
-            if circles is not None:
-                features['rings'] = len(circles[0])
+            if circles.result() is not None:
+                features['rings'] = len(circles.result()[0])
 
             # 檢測文字區域（可能的原子標記）
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            text_regions = 0
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if 10 < area < 1000:  # 適合文字的大小
-                    text_regions += 1
-            features['atoms'] = text_regions
+            features['atoms'] = atoms.result()
 
         except Exception as e:
             logger.warning(f"特徵檢測失敗: {str(e)}")
 
         return features
 
-    async def _infer_structures_from_features(self, features: Dict) -> Dict:
+    def _infer_structures_from_features(self, features: Dict) -> Dict:
         """基於特徵推斷化學結構"""
         result = {
             'smiles': [],
@@ -267,115 +420,109 @@ class ChemicalStructureAnalyzer:
         if rings > 0:
             result['structure_type'] = 'cyclic'
             if rings == 1:
-                result['smiles'].append('C1CCCCC1')  # 示例：環己烷
+                result['smiles'].append(self._INFERRED['ring1'][0])  # 示例：環己烷
             elif rings > 1:
-                result['smiles'].append('c1ccccc1')  # 示例：苯環
+                result['smiles'].append(self._INFERRED['aromatic'][0])  # 示例：苯環
         elif bonds > 5:
             result['structure_type'] = 'complex'
         elif bonds > 0:
             result['structure_type'] = 'linear'
-            result['smiles'].append('CCCCCC')  # 示例：己烷
+            result['smiles'].append(self._INFERRED['chain6'][0])  # 示例：己烷
 
         return result
 
-    async def _validate_smiles(self, smiles_list: List[str]) -> List[str]:
-        """驗證SMILES字符串"""
-        valid_smiles = []
+    def _validate_smiles(self, smiles_list: List[str]) -> List[Tuple[str, Chem.Mol]]:
+        """驗證SMILES字符串，返回去重後的(規範SMILES, 分子對象)列表"""
+        valid = {}
+
+        # 文本與圖像兩路結果合併後可能重複，先按原始字符串去重再解析
+        for smiles in dict.fromkeys(smiles_list):
+            # 推斷出的示例結構已是規範SMILES，無需再次解析
+            known = self._INFERRED_MOLS.get(smiles)
+            if known is not None:
+                valid.setdefault(smiles, known)
+                continue
 
-        for smiles in smiles_list:
             try:
-                mol = Chem.MolFromSmiles(smiles)
-                if mol is not None:
-                    # 標準化SMILES
-                    canonical_smiles = Chem.MolToSmiles(mol)
-                    valid_smiles.append(canonical_smiles)
+                # 標準化SMILES（同一寫法的解析與規範化結果已緩存），再按規範形式去重
+                canonical = _canonical_molecule(smiles)
+                if canonical is not None:
+                    valid.setdefault(*canonical)
                 else:
                     logger.warning(f"無效的SMILES: {smiles}")
             except Exception as e:
                 logger.warning(f"SMILES驗證失敗 {smiles}: {str(e)}")
 
-        return list(set(valid_smiles))
+        return list(valid.items())
 
-    async def _calculate_descriptors(self, smiles_list: List[str]) -> Dict:
+    def _calculate_descriptors(self, molecules: List[Tuple[str, Chem.Mol]]) -> Dict:
         """計算分子描述符"""
         descriptors = {}
 
-        for i, smiles in enumerate(smiles_list):
+        for i, (smiles, mol) in enumerate(molecules):
+            # 已是規範SMILES，可直接作為緩存鍵
+            cached_desc = DESC_CACHE.get(('descriptors', smiles))
+            if cached_desc is not None:
+                descriptors[f'molecule_{i+1}'] = cached_desc
+                continue
+
             try:
-                mol = Chem.MolFromSmiles(smiles)
                 if mol is not None:
                     desc = {
-                        'molecular_weight': rdMolDescriptors.CalcExactMolWt(mol),
-                        'logp': rdMolDescriptors.CalcCrippenDescriptors(mol)[0],
-                        'hbd': rdMolDescriptors.CalcNumHBD(mol),  # 氫鍵供體
-                        'hba': rdMolDescriptors.CalcNumHBA(mol),  # 氫鍵受體
+                        **self._lipinski_descriptors(mol),
                         'tpsa': rdMolDescriptors.CalcTPSA(mol),   # 拓撲極性表面積
                         'rotatable_bonds': rdMolDescriptors.CalcNumRotatableBonds(mol),
                         'ring_count': rdMolDescriptors.CalcNumRings(mol),
                         'aromatic_rings': rdMolDescriptors.CalcNumAromaticRings(mol)
                     }
                     descriptors[f'molecule_{i+1}'] = desc
+                    DESC_CACHE[('descriptors', smiles)] = desc
             except Exception as e:
                 logger.warning(f"計算描述符失敗 {smiles}: {str(e)}")
 
         return descriptors
 
-    async def _analyze_molecular_similarity(self, smiles_list: List[str]) -> Dict:
+    def _analyze_molecular_similarity(self, molecules: List[Tuple[str, Chem.Mol]]) -> Dict:
         """分析分子相似性"""
         similarity_matrix = {}
 
-        if len(smiles_list) < 2:
+        if len(molecules) < 2:
             return similarity_matrix
 
         try:
-            mols = []
-            fps = []
+            fps = morgan_fingerprints([mol for _, mol in molecules])
 
-            for smiles in smiles_list:
-                mol = Chem.MolFromSmiles(smiles)
-                if mol is not None:
-                    mols.append(mol)
-                    fp = AllChem.GetMorganFingerprintAsBitVect(mol, 2)
-                    fps.append(fp)
+            # 打包為uint64矩陣後一次性計算Tanimoto相似性
+            matrix = tanimoto_matrix(pack_fingerprints(fps))
 
-            # 計算Tanimoto相似性
-            for i in range(len(fps)):
-                for j in range(i+1, len(fps)):
-                    similarity = DataStructs.TanimotoSimilarity(fps[i], fps[j])
-                    similarity_matrix[f'{i+1}_vs_{j+1}'] = similarity
+            # 上三角一次性取出，再批量轉為Python浮點數
+            rows, cols = np.triu_indices(len(fps), k=1)
+            similarity_matrix = {
+                f'{i+1}_vs_{j+1}': value
+                for i, j, value in zip(rows.tolist(), cols.tolist(), matrix[rows, cols].tolist())
+            }
 
         except Exception as e:
             logger.warning(f"相似性分析失敗: {str(e)}")
 
         return similarity_matrix
 
-    async def generate_molecule_image(self, smiles: str, size: Tuple[int, int] = (300, 300)) -> bytes:
+    def generate_molecule_image(self, smiles: str, size: Tuple[int, int] = (300, 300)) -> bytes:
         """生成分子結構圖"""
         try:
-            mol = Chem.MolFromSmiles(smiles)
-            if mol is None:
-                raise ValueError(f"無效的SMILES: {smiles}")
-
-            # 生成2D座標
-            rdDepictor.Compute2DCoords(mol)
-
-            # 創建分子圖像
-            drawer = rdMolDraw2D.MolDraw2DCairo(size[0], size[1])
-            drawer.DrawMolecule(mol)
-            drawer.FinishDrawing()
-
-            # 轉換為bytes
-            img_data = drawer.GetDrawingText()
-            return img_data
+            # 以規範SMILES作為緩存鍵，同一分子的不同寫法共用圖像
+            canonical = _canonical_molecule(smiles)
+            key = canonical[0] if canonical is not None else smiles
+            return _render_molecule_png(key, size[0], size[1])
 
         except Exception as e:
             logger.error(f"生成分子圖像失敗: {str(e)}")
             raise
 
-    async def smiles_to_molecular_formula(self, smiles: str) -> str:
+    def smiles_to_molecular_formula(self, smiles: str) -> str:
         """將SMILES轉換為分子式"""
         try:
-            mol = Chem.MolFromSmiles(smiles)
+            mol = _mol_from_smiles_cached(smiles)
             if mol is not None:
                 return rdMolDescriptors.CalcMolFormula(mol)
             return ""
@@ -383,23 +530,26 @@ class ChemicalStructureAnalyzer:
             logger.warning(f"SMILES轉分子式失敗 {smiles}: {str(e)}")
             return ""
 
-    async def predict_properties(self, smiles: str) -> Dict:
+    def predict_properties(self, smiles: str) -> Dict:
         """預測分子性質"""
         try:
-            mol = Chem.MolFromSmiles(smiles)
+            mol = _mol_from_smiles_cached(smiles)
             if mol is None:
                 return {}
 
+            # Lipinski四項描述符只計算一次，性質輸出與規則評估共用
+            lipinski = self._lipinski_descriptors(mol)
+            drug_like, violations = self._lipinski_profile(lipinski)
             properties = {
-                'molecular_weight': rdMolDescriptors.CalcExactMolWt(mol),
+                'molecular_weight': lipinski['molecular_weight'],
                 'formula': rdMolDescriptors.CalcMolFormula(mol),
-                'logp': rdMolDescriptors.CalcCrippenDescriptors(mol)[0],
-                'hbd': rdMolDescriptors.CalcNumHBD(mol),
-                'hba': rdMolDescriptors.CalcNumHBA(mol),
+                'logp': lipinski['logp'],
+                'hbd': lipinski['hbd'],
+                'hba': lipinski['hba'],
                 'tpsa': rdMolDescriptors.CalcTPSA(mol),
                 'rotatable_bonds': rdMolDescriptors.CalcNumRotatableBonds(mol),
-                'drug_like': self._assess_drug_likeness(mol),
-                'lipinski_violations': self._count_lipinski_violations(mol)
+                'drug_like': drug_like,
+                'lipinski_violations': violations
             }
 
             return properties
@@ -408,41 +558,26 @@ class ChemicalStructureAnalyzer:
             logger.error(f"性質預測失敗: {str(e)}")
             return {}
 
-    def _assess_drug_likeness(self, mol) -> bool:
-        """評估藥物相似性（Lipinski五規則）"""
-        try:
-            mw = rdMolDescriptors.CalcExactMolWt(mol)
-            logp = rdMolDescriptors.CalcCrippenDescriptors(mol)[0]
-            hbd = rdMolDescriptors.CalcNumHBD(mol)
-            hba = rdMolDescriptors.CalcNumHBA(mol)
-
-            violations = 0
-            if mw > 500: violations += 1
-            if logp > 5: violations += 1
-            if hbd > 5: violations += 1
-            if hba > 10: violations += 1
-
-            return violations <= 1
-        except:
-            return False
-
-    def _count_lipinski_violations(self, mol) -> int:
-        """計算Lipinski規則違反數"""
-        try:
-            violations = 0
-            mw = rdMolDescriptors.CalcExactMolWt(mol)
-            logp = rdMolDescriptors.CalcCrippenDescriptors(mol)[0]
-            hbd = rdMolDescriptors.CalcNumHBD(mol)
-            hba = rdMolDescriptors.CalcNumHBA(mol)
-
-            if mw > 500: violations += 1
-            if logp > 5: violations += 1
-            if hbd > 5: violations += 1
-            if hba > 10: violations += 1
+    def _lipinski_descriptors(self, mol) -> Dict[str, float]:
+        """Lipinski五規則所需的描述符（分子量、logP、氫鍵供體/受體）"""
+        return {
+            'molecular_weight': rdMolDescriptors.CalcExactMolWt(mol),
+            'logp': rdMolDescriptors.CalcCrippenDescriptors(mol)[0],
+            'hbd': rdMolDescriptors.CalcNumHBD(mol),  # 氫鍵供體
+            'hba': rdMolDescriptors.CalcNumHBA(mol)   # 氫鍵受體
+        }
 
-            return violations
-        except:
-            return 0
+    def _lipinski_profile(self, lipinski: Dict[str, float]) -> Tuple[bool, int]:
+        """Lipinski五規則評估，基於已計算的描述符返回(是否類藥, 違反數)"""
+        violations = (
+            (lipinski['molecular_weight'] > 500) + (lipinski['logp'] > 5) +
+            (lipinski['hbd'] > 5) + (lipinski['hba'] > 10)
+        )
+        return violations <= 1, violations
 
 # 創建全局實例
 chem_analyzer = ChemicalStructureAnalyzer()
+
+def analyze_chemical_structure_sync(image_data: bytes = None, text: str = None) -> Dict:
+    """同步分析入口，供進程池調用"""
+    return chem_analyzer._run_pipeline(image_data=image_data, text=text)
@@ -1,23 +1,170 @@
 
-import matplotlib.pyplot as plt
-import seaborn as sns
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
-import pandas as pd
 import numpy as np
 from rdkit import Chem
-from rdkit.Chem import rdMolDescriptors, Draw, AllChem, Descriptors
+from rdkit.Chem import rdMolDescriptors, Draw, Descriptors, QED, RDConfig
 from rdkit.Chem.Draw import rdMolDraw2D
 from rdkit.Chem.Fingerprints import FingerprintMols
 from rdkit.Chem.AtomPairs import Pairs
 from rdkit.Chem.Pharm2D.SigFactory import SigFactory
 from rdkit.Chem.Pharm2D import Generate
-import io
-import base64
+import os
+import importlib.util
+import functools
+import asyncio
 from typing import List, Dict, Optional, Tuple, Any
 from loguru import logger
-import json
+from dataclasses import dataclass
+
+from app.core.cache import DESC_CACHE
+from app.core.config import settings
+from app.core.executor import run_in_pool
+from app.services.chemical_analyzer import _canonical_molecule
+from app.utils.fingerprints import decode_fingerprints, encode_fingerprint, morgan_fingerprints, tanimoto_matrix
+from app.utils.jit import njit, prange
+
+# MACCS鍵指紋接口在導入時探測一次，舊版RDKit缺失時為None
+_MACCS = getattr(rdMolDescriptors, 'GetMACCSKeysFingerprint', None)
+
+@functools.lru_cache(maxsize=1)
+def _load_sascorer():
+    """
+    從RDKit Contrib目錄加載Ertl SA評分模塊並讀取片段分數表；不可用時返回None
+
+    首次評分時才加載（每個進程一次），只導入本模塊而不計算分子性質的進程（如Web進程）無需承擔加載開銷
+    """
+    path = os.path.join(RDConfig.RDContribDir, 'SA_Score', 'sascorer.py')
+    if not os.path.exists(path):
+        return None
+
+    try:
+        spec = importlib.util.spec_from_file_location('sascorer', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.readFragmentScores()
+        return module
+    except Exception as e:
+        logger.warning(f"SA評分模塊加載失敗，使用簡化估算: {str(e)}")
+        return None
+
+def _to_builtin(obj):
+    """將圖表規格中的numpy數組與標量轉為Python原生類型（響應模型的pydantic序列化不接受numpy類型）"""
+    if isinstance(obj, dict):
+        return {key: _to_builtin(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_builtin(value) for value in obj]
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    return obj
+
+def _figure_spec(fig) -> Dict:
+    """將plotly圖表轉為規格字典（data/layout），隨響應一次性序列化，由前端以Plotly.newPlot渲染"""
+    return _to_builtin(fig.to_plotly_json())
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _summarise(values: np.ndarray, mask: np.ndarray):
+    """
+    按列並行計算統計量
+
+    Args:
+        values: (N, D) float32性質矩陣
+        mask: (N, D) 布爾矩陣，標記該分子是否有此性質
+
+    Returns:
+        ((D, 3) 數組 [mean, std, median], (D,) 最小值行號, (D,) 最大值行號, (D,) 每列有效值數量)
+
+    最值只返回行號，由調用方取回原始數值，避免float32精度損失出現在響應中。
+    """
+    n, d = values.shape
+    stats = np.zeros((d, 3))
+    argmin = np.zeros(d, dtype=np.int64)
+    argmax = np.zeros(d, dtype=np.int64)
+    counts = np.zeros(d, dtype=np.int32)
+
+    for j in prange(d):
+        k = 0
+        total = 0.0
+        for i in range(n):
+            if mask[i, j]:
+                v = values[i, j]
+                if k == 0 or v < values[argmin[j], j]:
+                    argmin[j] = i
+                if k == 0 or v > values[argmax[j], j]:
+                    argmax[j] = i
+                total += v
+                k += 1
+        counts[j] = k
+        if k == 0:
+            continue
+        mean = total / k
+
+        sq = 0.0
+        for i in range(n):
+            if mask[i, j]:
+                sq += (values[i, j] - mean) ** 2
+
+        stats[j, 0] = mean
+        stats[j, 1] = np.sqrt(sq / k)
+        stats[j, 2] = np.median(values[:, j][mask[:, j]])
+
+    return stats, argmin, argmax, counts
+
+@njit(parallel=True, cache=True)
+def _property_similarity(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """
+    標準化性質向量之間的相似性矩陣
+
+    Args:
+        values: (N, P) 已按尺度標準化的float64性質矩陣
+        present: (N, P) 布爾矩陣，標記該分子是否有此性質
+
+    Returns:
+        (N, N) 相似性矩陣，1 / (1 + 均方根距離)；每對分子只統計雙方都有的性質，無共同性質時為0
+    """
+    n, p = values.shape
+    sim = np.eye(n)
+
+    for i in prange(n):
+        for j in range(i + 1, n):
+            total = 0.0
+            count = 0
+            for k in range(p):
+                if present[i, k] and present[j, k]:
+                    diff = values[i, k] - values[j, k]
+                    total += diff * diff
+                    count += 1
+            s = 1.0 / (1.0 + np.sqrt(total / count)) if count > 0 else 0.0
+            sim[i, j] = s
+            sim[j, i] = s
+
+    return sim
+
+@dataclass(slots=True)
+class DescriptorBundle:
+    """單個分子的常用描述符，每項只調用RDKit計算一次"""
+    mw: float         # 平均分子量
+    logp: float
+    hbd: int          # 氫鍵供體
+    hba: int          # 氫鍵受體
+    tpsa: float       # 拓撲極性表面積
+    rotb: int         # 可旋轉鍵
+    num_rings: int
+    num_chiral: int   # 手性中心
+
+    @classmethod
+    def from_mol(cls, mol) -> "DescriptorBundle":
+        return cls(
+            mw=Descriptors.MolWt(mol),
+            logp=Descriptors.MolLogP(mol),
+            hbd=Descriptors.NumHDonors(mol),
+            hba=Descriptors.NumHAcceptors(mol),
+            tpsa=Descriptors.TPSA(mol),
+            rotb=Descriptors.NumRotatableBonds(mol),
+            num_rings=rdMolDescriptors.CalcNumRings(mol),
+            num_chiral=rdMolDescriptors.CalcNumAtomStereoCenters(mol)
+        )
 
 class MolecularPropertyCalculator:
     """分子性質計算和可視化器"""
@@ -36,6 +183,15 @@ class MolecularPropertyCalculator:
         # 圖表顏色調色板
         self.color_palette = px.colors.qualitative.Set3
 
+        # Ames致突變結構警報（SMARTS查詢預先編譯）
+        self._mutagenic_smarts = [
+            Chem.MolFromSmarts(smarts) for smarts in (
+                'N=N',            # 偶氮/重氮化合物
+                '[N+](=O)[O-]',   # 硝基化合物
+                'c-[NH2]',        # 芳香胺
+            )
+        ]
+
     async def calculate_all_properties(self, smiles_list: List[str]) -> Dict:
         """
         計算所有分子性質
@@ -49,31 +205,10 @@ class MolecularPropertyCalculator:
         try:
             logger.info(f"開始計算{len(smiles_list)}個分子的性質")
 
-            results = {
-                'molecules': [],
-                'properties_summary': {},
-                'comparisons': {},
-                'visualizations': {}
-            }
-
             # 為每個分子計算性質
-            for i, smiles in enumerate(smiles_list):
-                try:
-                    mol_properties = await self._calculate_single_molecule_properties(smiles, f"molecule_{i+1}")
-                    results['molecules'].append(mol_properties)
-                except Exception as e:
-                    logger.warning(f"計算分子{i+1}性質失敗: {str(e)}")
-                    continue
-
-            if results['molecules']:
-                # 生成統計摘要
-                results['properties_summary'] = await self._generate_properties_summary(results['molecules'])
+            molecules = await self.calculate_molecules(smiles_list)
 
-                # 分子間比較
-                results['comparisons'] = await self._compare_molecules(results['molecules'])
-
-                # 生成可視化圖表
-                results['visualizations'] = await self._generate_visualizations(results['molecules'])
+            results = await self.summarize_molecules([m for m in molecules if m is not None])
 
             logger.success(f"成功計算{len(results['molecules'])}個分子的性質")
             return results
@@ -82,12 +217,84 @@ class MolecularPropertyCalculator:
             logger.error(f"分子性質計算失敗: {str(e)}")
             raise
 
-    async def _calculate_single_molecule_properties(self, smiles: str, mol_id: str) -> Dict:
+    async def calculate_molecules(self, smiles_list: List[str]) -> List[Optional[Dict]]:
+        """
+        計算各分子性質，按工作進程數分塊後在進程池中並行執行
+
+        Returns:
+            與smiles_list等長的列表，計算失敗的分子對應None
+        """
+        if not smiles_list:
+            return []
+
+        # 跨進程只傳遞SMILES字符串；分塊以攤薄每次提交的序列化開銷
+        chunk_size = -(-len(smiles_list) // settings.MAX_CONCURRENT_TASKS)
+        chunks = await asyncio.gather(*(
+            run_in_pool(calculate_molecule_chunk_sync, smiles_list[start:start + chunk_size], start)
+            for start in range(0, len(smiles_list), chunk_size)
+        ))
+
+        return [mol for chunk in chunks for mol in chunk]
+
+    def calculate_molecule_chunk(self, smiles_list: List[str], offset: int = 0) -> List[Optional[Dict]]:
+        """
+        在當前進程中逐個計算一組分子的性質，編號從offset+1開始
+
+        結果按規範SMILES緩存在本進程的DESC_CACHE中（分子性質唯一的緩存層，API端點不再另行緩存），
+        重複出現的分子只複製頂層字典並改寫id與smiles；緩存中的嵌套字典被多次返回共用，調用方不應修改。
+        """
+        # 預分配結果列表，計算失敗的位置保持None
+        molecules: List[Optional[Dict]] = [None] * len(smiles_list)
+
+        for k, smiles in enumerate(smiles_list):
+            mol_id = f"molecule_{offset+k+1}"
+            try:
+                canonical = _canonical_molecule(smiles)
+                key = canonical[0] if canonical is not None else None
+                cached = DESC_CACHE.get(('properties', key)) if key is not None else None
+                if cached is not None:
+                    molecules[k] = {**cached, 'id': mol_id, 'smiles': smiles}
+                    continue
+
+                properties = self._calculate_single_molecule_properties(smiles, mol_id)
+                if key is not None:
+                    DESC_CACHE[('properties', key)] = properties
+                molecules[k] = {**properties}
+            except Exception as e:
+                logger.warning(f"計算分子{offset+k+1}性質失敗: {str(e)}")
+
+        return molecules
+
+    async def summarize_molecules(self, molecules: List[Dict]) -> Dict:
+        """基於已計算的分子性質生成摘要、比較和可視化"""
+        results = {
+            'molecules': molecules,
+            'properties_summary': {},
+            'comparisons': {},
+            'visualizations': {}
+        }
+
+        if molecules:
+            # 生成統計摘要
+            results['properties_summary'] = await self._generate_properties_summary(molecules)
+
+            # 分子間比較
+            results['comparisons'] = await self._compare_molecules(molecules)
+
+            # 生成可視化圖表
+            results['visualizations'] = await self._generate_visualizations(molecules)
+
+        return results
+
+    def _calculate_single_molecule_properties(self, smiles: str, mol_id: str) -> Dict:
         """計算單個分子的所有性質"""
         mol = Chem.MolFromSmiles(smiles)
         if mol is None:
             raise ValueError(f"無效的SMILES: {smiles}")
 
+        # 各項描述符只計算一次，供類藥性與ADMET規則共用
+        d = DescriptorBundle.from_mol(mol)
+
         properties = {
             'id': mol_id,
             'smiles': smiles,
@@ -100,216 +307,127 @@ class MolecularPropertyCalculator:
 
         # 基本性質
         properties['basic_properties'] = {
-            'molecular_weight': round(Descriptors.MolWt(mol), 2),
+            'molecular_weight': round(d.mw, 2),
             'molecular_formula': rdMolDescriptors.CalcMolFormula(mol),
             'num_atoms': mol.GetNumAtoms(),
             'num_bonds': mol.GetNumBonds(),
-            'num_rings': rdMolDescriptors.CalcNumRings(mol),
+            'num_rings': d.num_rings,
             'num_aromatic_rings': rdMolDescriptors.CalcNumAromaticRings(mol),
             'num_heavy_atoms': mol.GetNumHeavyAtoms()
         }
 
         # 理化性質
+        balaban_j = Descriptors.BalabanJ(mol)
         properties['physicochemical_properties'] = {
-            'logp': round(Descriptors.MolLogP(mol), 2),
-            'tpsa': round(Descriptors.TPSA(mol), 2),
-            'hbd': Descriptors.NumHDonors(mol),
-            'hba': Descriptors.NumHAcceptors(mol),
-            'rotatable_bonds': Descriptors.NumRotatableBonds(mol),
+            'logp': round(d.logp, 2),
+            'tpsa': round(d.tpsa, 2),
+            'hbd': d.hbd,
+            'hba': d.hba,
+            'rotatable_bonds': d.rotb,
             'formal_charge': Chem.rdmolops.GetFormalCharge(mol),
             'refractivity': round(Descriptors.MolMR(mol), 2),
-            'polarizability': round(Descriptors.BalabanJ(mol), 2) if Descriptors.BalabanJ(mol) else 0
+            'balaban_j': round(balaban_j, 2) if balaban_j else 0  # Balaban J拓撲指數
         }
 
         # 類藥性質
-        lipinski_violations = self._count_lipinski_violations(mol)
+        lipinski_violations = self._count_lipinski_violations(d)
         properties['drug_like_properties'] = {
             'lipinski_violations': lipinski_violations,
             'lipinski_compliant': lipinski_violations == 0,
             'qed_score': round(self._calculate_qed(mol), 3),
-            'sa_score': round(self._calculate_sa_score(mol), 3),
-            'bioavailability_score': round(self._calculate_bioavailability_score(mol), 3)
+            'sa_score': round(self._calculate_sa_score(mol, d), 3),
+            'bioavailability_score': round(self._calculate_bioavailability_score(d), 3)
         }
 
         # ADMET性質（簡化版）
         properties['admet_properties'] = {
-            'bbb_permeant': self._predict_bbb_permeation(mol),
-            'pgp_substrate': self._predict_pgp_substrate(mol),
-            'cyp_inhibitor': self._predict_cyp_inhibition(mol),
+            'bbb_permeant': self._predict_bbb_permeation(d),
+            'pgp_substrate': self._predict_pgp_substrate(d),
+            'cyp_inhibitor': self._predict_cyp_inhibition(d),
             'ames_mutagenicity': self._predict_ames_mutagenicity(mol),
-            'hepatotoxicity': self._predict_hepatotoxicity(mol)
+            'hepatotoxicity': self._predict_hepatotoxicity(d)
         }
 
-        # 分子指紋
+        # 分子指紋（按位打包後以base64存儲，可由decode_fingerprints直接還原為矩陣）
         properties['fingerprints'] = {
-            'morgan_fp': list(AllChem.GetMorganFingerprintAsBitVect(mol, 2, nBits=1024).ToBitString()),
-            'maccs_fp': list(rdMolDescriptors.GetMACCSKeysFingerprint(mol).ToBitString()) if hasattr(rdMolDescriptors, 'GetMACCSKeysFingerprint') else [],
+            'morgan_fp': encode_fingerprint(morgan_fingerprints([mol])[0]),
+            'maccs_fp': encode_fingerprint(_MACCS(mol)) if _MACCS is not None else '',
             'atom_pairs': len(Pairs.GetAtomPairFingerprint(mol).GetNonzeroElements())
         }
 
         return properties
 
-    def _count_lipinski_violations(self, mol) -> int:
+    def _count_lipinski_violations(self, d: DescriptorBundle) -> int:
         """計算Lipinski五規則違反數"""
         violations = 0
 
-        mw = Descriptors.MolWt(mol)
-        logp = Descriptors.MolLogP(mol)
-        hbd = Descriptors.NumHDonors(mol)
-        hba = Descriptors.NumHAcceptors(mol)
-
-        if mw > 500: violations += 1
-        if logp > 5: violations += 1
-        if hbd > 5: violations += 1
-        if hba > 10: violations += 1
+        if d.mw > 500: violations += 1
+        if d.logp > 5: violations += 1
+        if d.hbd > 5: violations += 1
+        if d.hba > 10: violations += 1
 
         return violations
 
     def _calculate_qed(self, mol) -> float:
-        """計算QED (Quantitative Estimate of Drug-likeness)"""
-        # 簡化的QED計算
-        try:
-            mw = Descriptors.MolWt(mol)
-            logp = Descriptors.MolLogP(mol)
-            hbd = Descriptors.NumHDonors(mol)
-            hba = Descriptors.NumHAcceptors(mol)
-            tpsa = Descriptors.TPSA(mol)
-            rotb = Descriptors.NumRotatableBonds(mol)
-
-            # 標準化分數 (簡化版)
-            mw_score = 1.0 if 150 <= mw <= 500 else max(0, 1 - abs(mw - 325) / 325)
-            logp_score = 1.0 if -2 <= logp <= 5 else max(0, 1 - abs(logp - 1.5) / 3.5)
-            hbd_score = 1.0 if hbd <= 5 else max(0, 1 - (hbd - 5) / 5)
-            hba_score = 1.0 if hba <= 10 else max(0, 1 - (hba - 10) / 10)
-            tpsa_score = 1.0 if tpsa <= 140 else max(0, 1 - (tpsa - 140) / 140)
-            rotb_score = 1.0 if rotb <= 10 else max(0, 1 - (rotb - 10) / 10)
-
-            # 幾何平均
-            qed = (mw_score * logp_score * hbd_score * hba_score * tpsa_score * rotb_score) ** (1/6)
-            return qed
+        """計算QED (Quantitative Estimate of Drug-likeness)，使用RDKit的Bickerton加權實現"""
+        return QED.qed(mol)
 
-        except Exception as e:
-            logger.warning(f"QED計算失敗: {str(e)}")
-            return 0.0
+    def _calculate_sa_score(self, mol, d: DescriptorBundle) -> float:
+        """計算合成可及性分數（1=易合成, 10=難合成）"""
+        sascorer = _load_sascorer()
+        if sascorer is not None:
+            return sascorer.calculateScore(mol)
 
-    def _calculate_sa_score(self, mol) -> float:
-        """計算合成可及性分數"""
-        # 簡化的SA分數計算
-        try:
-            # 基於分子複雜性的簡單估算
-            num_rings = rdMolDescriptors.CalcNumRings(mol)
-            num_chiral = rdMolDescriptors.CalcNumAtomStereoCenters(mol)
-            num_rotatable = Descriptors.NumRotatableBonds(mol)
-            mol_wt = Descriptors.MolWt(mol)
+        # Contrib模塊不可用時退回基於分子複雜性的簡單估算
+        complexity = (d.num_rings * 0.1 + d.num_chiral * 0.2 + 
+                     d.rotb * 0.05 + d.mw / 1000)
 
-            complexity = (num_rings * 0.1 + num_chiral * 0.2 + 
-                         num_rotatable * 0.05 + mol_wt / 1000)
+        # 轉換為1-10分數 (1=易合成, 10=難合成)
+        sa_score = min(10, max(1, 1 + complexity * 3))
+        return sa_score
 
-            # 轉換為1-10分數 (1=易合成, 10=難合成)
-            sa_score = min(10, max(1, 1 + complexity * 3))
-            return sa_score
-
-        except Exception as e:
-            logger.warning(f"SA分數計算失敗: {str(e)}")
-            return 5.0
-
-    def _calculate_bioavailability_score(self, mol) -> float:
+    def _calculate_bioavailability_score(self, d: DescriptorBundle) -> float:
         """計算生物利用度分數"""
         # 基於Abbott Bioavailability Score
-        try:
-            mw = Descriptors.MolWt(mol)
-            tpsa = Descriptors.TPSA(mol)
-
-            score = 0.0
-            if mw <= 500: score += 0.25
-            if tpsa <= 140: score += 0.25
-            if Descriptors.NumHDonors(mol) <= 5: score += 0.25
-            if Descriptors.NumHAcceptors(mol) <= 10: score += 0.25
+        score = 0.0
+        if d.mw <= 500: score += 0.25
+        if d.tpsa <= 140: score += 0.25
+        if d.hbd <= 5: score += 0.25
+        if d.hba <= 10: score += 0.25
 
-            return score
+        return score
 
-        except Exception as e:
-            logger.warning(f"生物利用度分數計算失敗: {str(e)}")
-            return 0.0
-
-    def _predict_bbb_permeation(self, mol) -> bool:
+    def _predict_bbb_permeation(self, d: DescriptorBundle) -> bool:
         """預測血腦屏障穿透性"""
-        # 簡化的BBB穿透預測
-        try:
-            mw = Descriptors.MolWt(mol)
-            logp = Descriptors.MolLogP(mol)
-            tpsa = Descriptors.TPSA(mol)
-
-            # 基本規則
-            return (mw < 450 and 0 < logp < 3 and tpsa < 90)
-
-        except:
-            return False
+        # 簡化的BBB穿透預測，基本規則
+        return (d.mw < 450 and 0 < d.logp < 3 and d.tpsa < 90)
 
-    def _predict_pgp_substrate(self, mol) -> bool:
+    def _predict_pgp_substrate(self, d: DescriptorBundle) -> bool:
         """預測P-糖蛋白底物"""
         # 簡化的P-gp預測
-        try:
-            mw = Descriptors.MolWt(mol)
-            logp = Descriptors.MolLogP(mol)
-
-            return (mw > 400 and logp > 2)
-
-        except:
-            return False
+        return (d.mw > 400 and d.logp > 2)
 
-    def _predict_cyp_inhibition(self, mol) -> Dict[str, bool]:
+    def _predict_cyp_inhibition(self, d: DescriptorBundle) -> Dict[str, bool]:
         """預測CYP抑制"""
         # 簡化的CYP抑制預測
-        try:
-            mw = Descriptors.MolWt(mol)
-            logp = Descriptors.MolLogP(mol)
-
-            return {
-                'cyp1a2': mw > 300 and logp > 2,
-                'cyp2c9': mw > 250 and logp > 1,
-                'cyp2c19': mw > 280 and logp > 1.5,
-                'cyp2d6': mw > 200 and logp > 0,
-                'cyp3a4': mw > 350 and logp > 3
-            }
-
-        except:
-            return {cyp: False for cyp in ['cyp1a2', 'cyp2c9', 'cyp2c19', 'cyp2d6', 'cyp3a4']}
+        mw, logp = d.mw, d.logp
+        return {
+            'cyp1a2': mw > 300 and logp > 2,
+            'cyp2c9': mw > 250 and logp > 1,
+            'cyp2c19': mw > 280 and logp > 1.5,
+            'cyp2d6': mw > 200 and logp > 0,
+            'cyp3a4': mw > 350 and logp > 3
+        }
 
     def _predict_ames_mutagenicity(self, mol) -> bool:
         """預測Ames致突變性"""
-        # 簡化的Ames預測 - 基於結構警報
-        try:
-            smiles = Chem.MolToSmiles(mol)
-
-            # 常見致突變結構片段
-            mutagenic_patterns = [
-                r'N=N',  # 重氮化合物
-                r'N\+.*O\-',  # 硝基化合物
-                r'c1cc.*N.*cc1',  # 芳香胺
-            ]
-
-            for pattern in mutagenic_patterns:
-                if pattern in smiles:
-                    return True
+        # 簡化的Ames預測 - 基於結構警報的子結構匹配
+        return any(mol.HasSubstructMatch(query) for query in self._mutagenic_smarts)
 
-            return False
-
-        except:
-            return False
-
-    def _predict_hepatotoxicity(self, mol) -> bool:
+    def _predict_hepatotoxicity(self, d: DescriptorBundle) -> bool:
         """預測肝毒性"""
-        # 簡化的肝毒性預測
-        try:
-            # 基於分子量和logP的簡單規則
-            mw = Descriptors.MolWt(mol)
-            logp = Descriptors.MolLogP(mol)
-
-            return (mw > 600 or logp > 6)
-
-        except:
-            return False
+        # 簡化的肝毒性預測，基於分子量和logP的簡單規則
+        return (d.mw > 600 or d.logp > 6)
 
     async def _generate_properties_summary(self, molecules: List[Dict]) -> Dict:
         """生成性質統計摘要"""
@@ -326,23 +444,32 @@ class MolecularPropertyCalculator:
             'rotatable_bonds', 'num_rings', 'qed_score', 'sa_score'
         ]
 
-        for prop in numeric_properties:
-            values = []
-            for mol in molecules:
-                if prop in mol['basic_properties']:
-                    values.append(mol['basic_properties'][prop])
-                elif prop in mol['physicochemical_properties']:
-                    values.append(mol['physicochemical_properties'][prop])
-                elif prop in mol['drug_like_properties']:
-                    values.append(mol['drug_like_properties'][prop])
-
-            if values:
+        # 每個分子的各類性質先合併為一層字典（同名性質按basic > physicochemical > drug_like優先），
+        # 再按列取值，免去逐性質逐類別的查找
+        records = [
+            {**mol['drug_like_properties'], **mol['physicochemical_properties'], **mol['basic_properties']}
+            for mol in molecules
+        ]
+        raw = [[record.get(prop) for prop in numeric_properties] for record in records]
+
+        # 將性質堆疊為(N, D)的float32矩陣（描述符精度足夠，帶寬減半），一次性並行求各列統計量
+        mask = np.array([[v is not None for v in row] for row in raw], dtype=np.bool_)
+        values = np.array([[0.0 if v is None else v for v in row] for row in raw], dtype=np.float32)
+
+        stats, argmin, argmax, counts = _summarise(values, mask)
+
+        # 統計量整體取整後一次轉為Python浮點數
+        rounded = np.round(stats, 2).tolist()
+
+        for j, prop in enumerate(numeric_properties):
+            if counts[j]:
+                mean, std, median = rounded[j]
                 summary['statistics'][prop] = {
-                    'mean': round(np.mean(values), 2),
-                    'std': round(np.std(values), 2),
-                    'min': min(values),
-                    'max': max(values),
-                    'median': round(np.median(values), 2)
+                    'mean': mean,
+                    'std': std,
+                    'min': raw[argmin[j]][j],
+                    'max': raw[argmax[j]][j],
+                    'median': median
                 }
 
         # 計算合規率
@@ -363,13 +490,15 @@ class MolecularPropertyCalculator:
         if len(molecules) < 2:
             return comparisons
 
-        # 生成相似性矩陣 (基於性質相似性)
-        similarity_matrix = np.zeros((len(molecules), len(molecules)))
-
-        for i in range(len(molecules)):
-            for j in range(i+1, len(molecules)):
-                similarity = self._calculate_property_similarity(molecules[i], molecules[j])
-                similarity_matrix[i][j] = similarity_matrix[j][i] = similarity
+        # 生成相似性矩陣：優先使用Morgan指紋的Tanimoto相似性（打包後一次性計算），
+        # 缺少指紋時退回基於性質的相似性
+        morgan = [mol.get('fingerprints', {}).get('morgan_fp') for mol in molecules]
+        if all(isinstance(fp, str) and fp for fp in morgan) and len({len(fp) for fp in morgan}) == 1:
+            similarity_matrix = tanimoto_matrix(decode_fingerprints(morgan))
+            comparisons['similarity_method'] = 'morgan_tanimoto'
+        else:
+            similarity_matrix = self._property_similarity_matrix(molecules)
+            comparisons['similarity_method'] = 'property'
 
         comparisons['similarity_matrix'] = similarity_matrix.tolist()
 
@@ -384,76 +513,84 @@ class MolecularPropertyCalculator:
 
         return comparisons
 
-    def _calculate_property_similarity(self, mol1: Dict, mol2: Dict) -> float:
-        """計算兩個分子的性質相似性"""
-        # 基於關鍵性質的歐幾里得距離
-        try:
-            props = ['molecular_weight', 'logp', 'tpsa', 'hbd', 'hba']
-
-            diff_sum = 0
-            count = 0
-
-            for prop in props:
-                val1 = None
-                val2 = None
-
-                # 查找性質值
-                for category in ['basic_properties', 'physicochemical_properties']:
-                    if prop in mol1.get(category, {}):
-                        val1 = mol1[category][prop]
-                    if prop in mol2.get(category, {}):
-                        val2 = mol2[category][prop]
-
-                if val1 is not None and val2 is not None:
-                    # 標準化差異
-                    if prop == 'molecular_weight':
-                        diff = abs(val1 - val2) / 500  # 標準化到500Da
-                    elif prop == 'logp':
-                        diff = abs(val1 - val2) / 5    # 標準化到5
-                    elif prop == 'tpsa':
-                        diff = abs(val1 - val2) / 140  # 標準化到140
-                    else:
-                        diff = abs(val1 - val2) / 10   # 默認標準化
-
-                    diff_sum += diff ** 2
-                    count += 1
-
-            if count > 0:
-                euclidean_dist = np.sqrt(diff_sum / count)
-                similarity = 1 / (1 + euclidean_dist)  # 轉換為相似性分數
-                return similarity
-
-        except Exception as e:
-            logger.warning(f"相似性計算失敗: {str(e)}")
-
-        return 0.0
+    # 性質相似性使用的性質及其標準化尺度
+    _SIMILARITY_SCALES = {
+        'molecular_weight': 500,  # 標準化到500Da
+        'logp': 5,                # 標準化到5
+        'tpsa': 140,              # 標準化到140
+        'hbd': 10,                # 默認標準化
+        'hba': 10
+    }
+
+    def _property_similarity_matrix(self, molecules: List[Dict]) -> np.ndarray:
+        """基於關鍵性質標準化歐幾里得距離的相似性矩陣，成對距離由JIT內核一次計算"""
+        props = list(self._SIMILARITY_SCALES)
+        records = [
+            {**mol.get('basic_properties', {}), **mol.get('physicochemical_properties', {})}
+            for mol in molecules
+        ]
+        raw = [[record.get(prop) for prop in props] for record in records]
+
+        # (N, P)的性質矩陣與有效值掩碼；每對分子只統計雙方都有的性質
+        present = np.array([[v is not None for v in row] for row in raw], dtype=np.bool_)
+        values = np.array([[0.0 if v is None else v for v in row] for row in raw], dtype=np.float64)
+        values /= np.array([self._SIMILARITY_SCALES[p] for p in props], dtype=np.float64)
+
+        return _property_similarity(values, present)
+
+    # 可視化使用的性質列：(性質, 所屬類別)
+    _PLOT_COLUMNS = (
+        ('molecular_weight', 'basic_properties'),
+        ('logp', 'physicochemical_properties'),
+        ('tpsa', 'physicochemical_properties'),
+        ('hbd', 'physicochemical_properties'),
+        ('hba', 'physicochemical_properties'),
+        ('rotatable_bonds', 'physicochemical_properties'),
+        ('qed_score', 'drug_like_properties'),
+        ('lipinski_compliant', 'drug_like_properties'),
+        ('bbb_permeant', 'admet_properties'),
+        ('pgp_substrate', 'admet_properties'),
+        ('ames_mutagenicity', 'admet_properties'),
+        ('hepatotoxicity', 'admet_properties')
+    )
+
+    def _plot_columns(self, molecules: List[Dict]) -> Dict[str, np.ndarray]:
+        """一次遍歷分子列表，按性質提取列數組（缺失值記為NaN，布爾值記為0/1），供各圖表共用"""
+        raw = np.array(
+            [[mol.get(category, {}).get(prop, np.nan) for prop, category in self._PLOT_COLUMNS]
+             for mol in molecules],
+            dtype=np.float64
+        ).reshape(len(molecules), len(self._PLOT_COLUMNS))
+
+        # 轉置為按列連續存儲，各列切片無需複製
+        columns = np.ascontiguousarray(raw.T)
+        return {prop: columns[j] for j, (prop, _) in enumerate(self._PLOT_COLUMNS)}
 
     async def _generate_visualizations(self, molecules: List[Dict]) -> Dict:
         """生成可視化圖表"""
         visualizations = {}
 
         try:
-            # 1. 性質分布圖
-            visualizations['property_distributions'] = await self._create_property_distribution_plots(molecules)
-
-            # 2. 分子比較雷達圖
-            visualizations['radar_charts'] = await self._create_radar_charts(molecules)
-
-            # 3. 相關性熱力圖
-            visualizations['correlation_heatmap'] = await self._create_correlation_heatmap(molecules)
-
-            # 4. 類藥性分析圖
-            visualizations['drug_likeness_analysis'] = await self._create_drug_likeness_plots(molecules)
-
-            # 5. ADMET預測圖
-            visualizations['admet_predictions'] = await self._create_admet_plots(molecules)
+            cols = self._plot_columns(molecules)
+
+            # 圖表構建是純Python的plotly對象操作，受GIL限制，線程並行無收益，按順序生成；
+            # 各圖表的構建函數自行捕獲異常，單個圖表失敗不影響其餘圖表
+            builders = {
+                'property_distributions': self._create_property_distribution_plots,  # 性質分布圖
+                'radar_charts': self._create_radar_charts,                      # 分子比較雷達圖
+                'correlation_heatmap': self._create_correlation_heatmap,        # 相關性熱力圖
+                'drug_likeness_analysis': self._create_drug_likeness_plots,     # 類藥性分析圖
+                'admet_predictions': self._create_admet_plots                   # ADMET預測圖
+            }
+            for name, build in builders.items():
+                visualizations[name] = build(cols, molecules)
 
         except Exception as e:
             logger.error(f"可視化生成失敗: {str(e)}")
 
         return visualizations
 
-    async def _create_property_distribution_plots(self, molecules: List[Dict]) -> str:
+    def _create_property_distribution_plots(self, cols: Dict[str, np.ndarray], molecules: List[Dict]) -> Optional[Dict]:
         """創建性質分布圖"""
         try:
             fig = make_subplots(
@@ -465,18 +602,18 @@ class MolecularPropertyCalculator:
             )
 
             properties = [
-                ('molecular_weight', 'basic_properties', 1, 1),
-                ('logp', 'physicochemical_properties', 1, 2),
-                ('tpsa', 'physicochemical_properties', 1, 3),
-                ('hbd', 'physicochemical_properties', 2, 1),
-                ('hba', 'physicochemical_properties', 2, 2),
-                ('rotatable_bonds', 'physicochemical_properties', 2, 3)
+                ('molecular_weight', 1, 1),
+                ('logp', 1, 2),
+                ('tpsa', 1, 3),
+                ('hbd', 2, 1),
+                ('hba', 2, 2),
+                ('rotatable_bonds', 2, 3)
             ]
 
-            for prop, category, row, col in properties:
-                values = [mol[category][prop] for mol in molecules if prop in mol[category]]
+            for prop, row, col in properties:
+                values = cols[prop][~np.isnan(cols[prop])]
 
-                if values:
+                if values.size:
                     fig.add_trace(
                         go.Histogram(x=values, name=prop, showlegend=False),
                         row=row, col=col
@@ -488,37 +625,33 @@ class MolecularPropertyCalculator:
                 template='plotly_white'
             )
 
-            return fig.to_html(include_plotlyjs='cdn')
+            return _figure_spec(fig)
 
         except Exception as e:
             logger.error(f"性質分布圖創建失敗: {str(e)}")
-            return ""
+            return None
 
-    async def _create_radar_charts(self, molecules: List[Dict]) -> str:
+    def _create_radar_charts(self, cols: Dict[str, np.ndarray], molecules: List[Dict]) -> Optional[Dict]:
         """創建雷達圖"""
         try:
-            if len(molecules) > 5:  # 限制顯示數量
-                molecules = molecules[:5]
+            n = min(len(molecules), 5)  # 限制顯示數量
 
             fig = go.Figure()
 
             categories = ['分子量 (標準化)', 'LogP', 'TPSA (標準化)', 
                          'HBD', 'HBA', 'QED分數']
 
-            for mol in molecules:
-                # 標準化數值到0-1範圍
-                mw_norm = min(mol['basic_properties']['molecular_weight'] / 500, 1)
-                tpsa_norm = min(mol['physicochemical_properties']['tpsa'] / 140, 1)
-
-                values = [
-                    mw_norm,
-                    mol['physicochemical_properties']['logp'] / 5,
-                    tpsa_norm,
-                    mol['physicochemical_properties']['hbd'] / 5,
-                    mol['physicochemical_properties']['hba'] / 10,
-                    mol['drug_like_properties']['qed_score']
-                ]
+            # 標準化數值到0-1範圍，每行為一個分子
+            radar = np.column_stack([
+                np.minimum(cols['molecular_weight'][:n] / 500, 1),
+                cols['logp'][:n] / 5,
+                np.minimum(cols['tpsa'][:n] / 140, 1),
+                cols['hbd'][:n] / 5,
+                cols['hba'][:n] / 10,
+                cols['qed_score'][:n]
+            ])
 
+            for mol, values in zip(molecules[:n], radar.tolist()):
                 fig.add_trace(go.Scatterpolar(
                     r=values,
                     theta=categories,
@@ -536,37 +669,30 @@ class MolecularPropertyCalculator:
                 template='plotly_white'
             )
 
-            return fig.to_html(include_plotlyjs='cdn')
+            return _figure_spec(fig)
 
         except Exception as e:
             logger.error(f"雷達圖創建失敗: {str(e)}")
-            return ""
+            return None
 
-    async def _create_correlation_heatmap(self, molecules: List[Dict]) -> str:
+    def _create_correlation_heatmap(self, cols: Dict[str, np.ndarray], molecules: List[Dict]) -> Optional[Dict]:
         """創建相關性熱力圖"""
         try:
-            # 準備數據
+            # 準備數據（缺失值記為0）
             properties = ['molecular_weight', 'logp', 'tpsa', 'hbd', 'hba', 'rotatable_bonds']
-            data = []
-
-            for mol in molecules:
-                row = []
-                for prop in properties:
-                    if prop in mol['basic_properties']:
-                        row.append(mol['basic_properties'][prop])
-                    elif prop in mol['physicochemical_properties']:
-                        row.append(mol['physicochemical_properties'][prop])
-                    else:
-                        row.append(0)
-                data.append(row)
-
-            df = pd.DataFrame(data, columns=properties)
-            corr_matrix = df.corr()
+            data = np.nan_to_num(np.column_stack([cols[prop] for prop in properties]), nan=0.0)
+
+            # 直接以NumPy計算列相關係數；常數列或樣本不足時與pandas一致記為NaN
+            if len(data) < 2:
+                corr_matrix = np.full((len(properties), len(properties)), np.nan)
+            else:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    corr_matrix = np.corrcoef(data, rowvar=False)
 
             fig = go.Figure(data=go.Heatmap(
-                z=corr_matrix.values,
-                x=corr_matrix.columns,
-                y=corr_matrix.columns,
+                z=corr_matrix,
+                x=properties,
+                y=properties,
                 colorscale='RdBu',
                 zmid=0
             ))
@@ -576,13 +702,13 @@ class MolecularPropertyCalculator:
                 template='plotly_white'
             )
 
-            return fig.to_html(include_plotlyjs='cdn')
+            return _figure_spec(fig)
 
         except Exception as e:
             logger.error(f"相關性熱力圖創建失敗: {str(e)}")
-            return ""
+            return None
 
-    async def _create_drug_likeness_plots(self, molecules: List[Dict]) -> str:
+    def _create_drug_likeness_plots(self, cols: Dict[str, np.ndarray], molecules: List[Dict]) -> Optional[Dict]:
         """創建類藥性分析圖"""
         try:
             fig = make_subplots(
@@ -592,8 +718,7 @@ class MolecularPropertyCalculator:
             )
 
             # Lipinski合規性
-            compliant = sum(1 for mol in molecules 
-                          if mol['drug_like_properties']['lipinski_compliant'])
+            compliant = int(np.nansum(cols['lipinski_compliant']))
             non_compliant = len(molecules) - compliant
 
             fig.add_trace(
@@ -603,9 +728,8 @@ class MolecularPropertyCalculator:
             )
 
             # QED分數分布
-            qed_scores = [mol['drug_like_properties']['qed_score'] for mol in molecules]
             fig.add_trace(
-                go.Histogram(x=qed_scores, nbinsx=10, marker_color='blue'),
+                go.Histogram(x=cols['qed_score'], nbinsx=10, marker_color='blue'),
                 row=1, col=2
             )
 
@@ -615,21 +739,21 @@ class MolecularPropertyCalculator:
                 showlegend=False
             )
 
-            return fig.to_html(include_plotlyjs='cdn')
+            return _figure_spec(fig)
 
         except Exception as e:
             logger.error(f"類藥性分析圖創建失敗: {str(e)}")
-            return ""
+            return None
 
-    async def _create_admet_plots(self, molecules: List[Dict]) -> str:
+    def _create_admet_plots(self, cols: Dict[str, np.ndarray], molecules: List[Dict]) -> Optional[Dict]:
         """創建ADMET預測圖"""
         try:
             # 準備ADMET數據
             admet_data = {
-                'BBB穿透': sum(1 for mol in molecules if mol['admet_properties']['bbb_permeant']),
-                'P-gp底物': sum(1 for mol in molecules if mol['admet_properties']['pgp_substrate']),
-                'Ames致突變': sum(1 for mol in molecules if mol['admet_properties']['ames_mutagenicity']),
-                '肝毒性': sum(1 for mol in molecules if mol['admet_properties']['hepatotoxicity'])
+                'BBB穿透': int(np.nansum(cols['bbb_permeant'])),
+                'P-gp底物': int(np.nansum(cols['pgp_substrate'])),
+                'Ames致突變': int(np.nansum(cols['ames_mutagenicity'])),
+                '肝毒性': int(np.nansum(cols['hepatotoxicity']))
             }
 
             fig = go.Figure(data=[
@@ -646,11 +770,19 @@ class MolecularPropertyCalculator:
                 template='plotly_white'
             )
 
-            return fig.to_html(include_plotlyjs='cdn')
+            return _figure_spec(fig)
 
         except Exception as e:
             logger.error(f"ADMET預測圖創建失敗: {str(e)}")
-            return ""
+            return None
 
 # 創建全局實例
 molecular_calculator = MolecularPropertyCalculator()
+
+def calculate_molecule_chunk_sync(smiles_list: List[str], offset: int) -> List[Optional[Dict]]:
+    """同步分塊計算入口，供進程池調用"""
+    return molecular_calculator.calculate_molecule_chunk(smiles_list, offset)
+
+def summarize_molecules_sync(molecules: List[Dict]) -> Dict:
+    """同步摘要入口，供進程池調用"""
+    return asyncio.run(molecular_calculator.summarize_molecules(molecules))
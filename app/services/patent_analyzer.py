@@ -1,28 +1,122 @@
 
 import re
+import asyncio
+import functools
 import spacy
 from typing import List, Dict, Optional, Tuple, Set
 import numpy as np
-from collections import defaultdict, Counter
+from collections import defaultdict, deque, Counter
 from datetime import datetime
 import json
 from loguru import logger
 
+from app.core.config import settings
+from app.utils.keywords import KeywordMatcher
+
+# 各語言的spaCy模型（模型名, 語言名稱），首次分析該語言文本時才加載
+_SPACY_MODELS = {
+    'en': ('en_core_web_sm', '英文'),
+    'zh': ('zh_core_web_sm', '中文')
+}
+
+# 技術特徵提取只使用命名實體，其餘組件加載後即停用
+_UNUSED_PIPES = ('tagger', 'parser', 'attribute_ruler', 'lemmatizer')
+
+# 權利要求編號模式（按語言），模塊加載時編譯一次
+# 每種語言一個交替模式：先嘗試帶關鍵詞的編號（kw_num/kw_text），再嘗試純數字編號（num/text）；
+# 單次掃描中已匹配的片段不再被其他分支重複匹配。權利要求在下一個編號標頭處結束：
+# 標頭須帶分隔符（正文中的「根據權利要求1」不算），且分隔符後不接數字（「3.5」不算）
+_CLAIM_PATTERNS = {
+    'zh': re.compile(
+        r'(?:權利要求|請求項)\s*(?P<kw_num>\d+)[：:](?P<kw_text>.*?)'
+        r'(?=(?:權利要求|請求項)\s*\d+[：:]|\d+\s*[.、](?!\d)|$)'
+        r'|(?P<num>\d+)\s*[.、](?!\d)\s*(?P<text>.*?)'
+        r'(?=(?:權利要求|請求項)\s*\d+[：:]|\d+\s*[.、](?!\d)|$)',
+        re.DOTALL | re.IGNORECASE
+    ),
+    'en': re.compile(
+        r'Claim\s*(?P<kw_num>\d+)[.:](?!\d)(?P<kw_text>.*?)(?=Claim\s*\d+[.:](?!\d)|\d+\s*\.(?!\d)|$)'
+        r'|(?P<num>\d+)\s*\.(?!\d)(?P<text>.*?)(?=Claim\s*\d+[.:](?!\d)|\d+\s*\.(?!\d)|$)',
+        re.DOTALL | re.IGNORECASE
+    )
+}
+
+# 段落分隔
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+
+# 權利要求引用（中英文合併為單一捕獲組）
+_CLAIM_REF_RE = re.compile(r'(?:權利要求|claim)\s*(\d+)', re.IGNORECASE)
+
+# 技術特徵：化學實體與工藝參數
+_CHEMICAL_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r'[A-Z][a-z]?\d*(?:[A-Z][a-z]?\d*)+',  # 分子式（至少兩個元素單元，排除單個字母）
+        r'\b\w*(?:化合物|compound|molecule)\w*\b',  # 化合物相關
+        r'\b\w*(?:基團|group|radical)\w*\b'  # 基團相關
+    )
+]
+_PARAMETER_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r'(\d+(?:\.\d+)?)\s*(?:℃|°C|度)',  # 溫度
+        r'(\d+(?:\.\d+)?)\s*(?:小時|h|hour)',  # 時間
+        r'(\d+(?:\.\d+)?)\s*(?:%|百分比|percent)',  # 百分比
+        r'(\d+(?:\.\d+)?)\s*(?:MPa|Pa|壓力)',  # 壓力
+    )
+]
+
+# 中文字符（語言檢測）；短文本用正則，長文本按UTF-32碼點向量化計數
+_CHINESE_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
+_CJK_FIRST = np.uint32(0x4e00)
+_CJK_SPAN = 0x9fff - 0x4e00 + 1
+_VECTORIZE_MIN_CHARS = 256
+
+# 各語言的關鍵詞類別；權利要求類型按product > method > use > composition的順序判定
+_CLAIM_KEYWORDS = {
+    'zh': {
+        'product': ['化合物', '分子', '物質'],
+        'method': ['方法', '工藝', '步驟'],
+        'use': ['用途', '應用', '治療'],
+        'composition': ['組成物', '製劑', '配方'],
+        'claim_like': ['包含', '包括', '含有', '特徵在於', '其中'],
+        'dependency': ['根據權利要求', '如權利要求', '依照權利要求'],
+        'innovation': [
+            '新穎', '創新', '改進', '優化', '突破', '首次',
+            '顯著', '明顯', '更好', '提高', '增強', '減少'
+        ],
+        'advantage': ['優點', '優勢', '有益效果', '技術效果', '改善', '提升']
+    },
+    'en': {
+        'product': ['compound', 'molecule', 'substance'],
+        'method': ['method', 'process', 'step'],
+        'use': ['use', 'application', 'treatment'],
+        'composition': ['composition', 'formulation'],
+        'claim_like': ['comprising', 'including', 'wherein', 'characterized'],
+        'dependency': ['according to claim', 'as claimed in', 'of claim'],
+        'innovation': [
+            'novel', 'innovative', 'improved', 'enhanced', 'new',
+            'significantly', 'substantially', 'better', 'superior'
+        ],
+        'advantage': ['advantage', 'benefit', 'improvement', 'enhancement', 'effect']
+    }
+}
+
+# 每個(語言, 類別)一個匹配器，模塊加載時構建
+_MATCHERS = {
+    language: {category: KeywordMatcher(words) for category, words in categories.items()}
+    for language, categories in _CLAIM_KEYWORDS.items()
+}
+
+_CLAIM_TYPES = ('product', 'method', 'use', 'composition')
+
+# 命名實體識別只處理可能出現化學實體名稱的權利要求類型
+_NER_CLAIM_TYPES = frozenset({'product', 'composition', 'use'})
+
 class PatentClaimsAnalyzer:
     """專利權利要求深度分析器"""
 
     def __init__(self):
-        # 嘗試加載spaCy模型
+        # spaCy模型按語言懶加載（見_get_nlp_model），未安裝的模型記為None
         self.nlp_models = {}
-        try:
-            self.nlp_models['en'] = spacy.load('en_core_web_sm')
-        except OSError:
-            logger.warning("英文spaCy模型未安裝")
-
-        try:
-            self.nlp_models['zh'] = spacy.load('zh_core_web_sm')
-        except OSError:
-            logger.warning("中文spaCy模型未安裝")
 
         # 專利相關關鍵詞
         self.patent_keywords = {
@@ -46,6 +140,29 @@ class PatentClaimsAnalyzer:
             ]
         }
 
+    def _get_nlp_model(self, language: str):
+        """返回語言對應的spaCy模型，首次調用時加載；模型未安裝或不支持該語言時返回None"""
+        if language not in self.nlp_models:
+            model = None
+            if language in _SPACY_MODELS:
+                name, label = _SPACY_MODELS[language]
+                try:
+                    model = self._load_ner_model(name)
+                except OSError:
+                    logger.warning(f"{label}spaCy模型未安裝")
+            self.nlp_models[language] = model
+
+        return self.nlp_models[language]
+
+    @staticmethod
+    def _load_ner_model(name: str):
+        """加載spaCy模型並停用命名實體識別以外的組件"""
+        nlp = spacy.load(name)
+        nlp.select_pipes(disable=[pipe for pipe in _UNUSED_PIPES if pipe in nlp.pipe_names])
+        # 逐條權利要求送入管線，單條長度上限顯式設定，不對文本做截斷
+        nlp.max_length = settings.SPACY_MAX_LENGTH
+        return nlp
+
     async def analyze_patent_claims(self, text: str, language: str = 'auto') -> Dict:
         """
         分析專利權利要求
@@ -63,36 +180,47 @@ class PatentClaimsAnalyzer:
             # 自動檢測語言
             if language == 'auto':
                 language = self._detect_language(text)
-                logger.info(f"檢測到語言: {language}")
-
-            # 提取權利要求
-            claims = await self._extract_claims(text, language)
+                logger.debug(f"檢測到語言: {language}")
+
+            # 提取權利要求，並一次遍歷匯總各項分析共用的統計量
+            claims = self._extract_claims(text, language)
+            stats = self._collect_claim_stats(claims, language)
+
+            # 提取技術特徵：有spaCy模型時命名實體識別在線程中進行（提交後立即開始），
+            # 與下面純規則的各項分析重疊執行；模型在提交前於當前線程加載
+            if self._get_nlp_model(language) is not None:
+                features_future = asyncio.get_running_loop().run_in_executor(
+                    None, self._extract_technical_features, claims, language
+                )
+            else:
+                features_future = None
+                technical_features = self._extract_technical_features(claims, language)
 
             # 分析權利要求結構
-            claim_structure = await self._analyze_claim_structure(claims, language)
+            claim_structure = self._analyze_claim_structure(stats)
 
             # 分析依賴關係
-            dependencies = await self._analyze_claim_dependencies(claims)
-
-            # 提取技術特徵
-            technical_features = await self._extract_technical_features(claims, language)
+            dependencies = self._analyze_claim_dependencies(claims)
 
             # 分析創新點
-            innovations = await self._identify_innovations(claims, language)
+            innovations = self._identify_innovations(claims, language)
 
             # 計算覆蓋範圍
-            coverage_analysis = await self._analyze_coverage_scope(claims)
+            coverage_analysis = self._analyze_coverage_scope(stats)
 
             # 檢測潛在問題
-            potential_issues = await self._detect_potential_issues(claims, language)
+            potential_issues = self._detect_potential_issues(claims, stats)
 
             # 生成建議
-            suggestions = await self._generate_suggestions(claims, potential_issues)
+            suggestions = self._generate_suggestions(claims, stats, potential_issues)
+
+            if features_future is not None:
+                technical_features = await features_future
 
             result = {
                 'total_claims': len(claims),
                 'language': language,
-                'claims': claims,
+                'claims': [self._public_claim(claim) for claim in claims],
                 'structure_analysis': claim_structure,
                 'dependency_tree': dependencies,
                 'technical_features': technical_features,
@@ -100,7 +228,7 @@ class PatentClaimsAnalyzer:
                 'coverage_scope': coverage_analysis,
                 'potential_issues': potential_issues,
                 'suggestions': suggestions,
-                'analysis_summary': self._generate_summary(claims, technical_features, innovations)
+                'analysis_summary': self._generate_summary(stats, technical_features, innovations)
             }
 
             logger.success(f"專利分析完成，共分析{len(claims)}項權利要求")
@@ -110,95 +238,84 @@ class PatentClaimsAnalyzer:
             logger.error(f"專利分析失敗: {str(e)}")
             raise
 
-    async def _extract_claims(self, text: str, language: str) -> List[Dict]:
+    def _extract_claims(self, text: str, language: str) -> List[Dict]:
         """提取權利要求"""
         claims = []
 
-        # 不同語言的權利要求模式
-        if language == 'zh':
-            patterns = [
-                r'權利要求\s*(\d+)[：:](.*?)(?=權利要求\s*\d+|$)',
-                r'請求項\s*(\d+)[：:](.*?)(?=請求項\s*\d+|$)',
-                r'(\d+)\s*[.、]\s*(.*?)(?=\d+\s*[.、]|$)'
-            ]
-        else:
-            patterns = [
-                r'Claim\s*(\d+)[.:](.*?)(?=Claim\s*\d+|$)',
-                r'(\d+)\s*\.(.*?)(?=\d+\s*\.|$)'
-            ]
-
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.DOTALL | re.IGNORECASE)
-            for match in matches:
-                claim_number = int(match.group(1))
-                claim_text = match.group(2).strip()
+        # 不同語言的權利要求模式，單次掃描；同一編號只保留首次有效匹配
+        pattern = _CLAIM_PATTERNS['zh' if language == 'zh' else 'en']
+        seen = set()
 
-                if len(claim_text) > 10:  # 過濾太短的匹配
-                    claims.append({
-                        'number': claim_number,
-                        'text': claim_text,
-                        'type': self._classify_claim_type(claim_text, language),
-                        'word_count': len(claim_text.split()),
-                        'complexity_score': self._calculate_complexity(claim_text)
-                    })
+        for match in pattern.finditer(text):
+            if match.group('kw_num') is not None:
+                claim_number = int(match.group('kw_num'))
+                claim_text = match.group('kw_text').strip()
+            else:
+                claim_number = int(match.group('num'))
+                claim_text = match.group('text').strip()
+
+            if claim_number in seen:
+                continue
+
+            if len(claim_text) > 10:  # 過濾太短的匹配
+                seen.add(claim_number)
+                claim_lower = claim_text.lower()
+                claims.append({
+                    'number': claim_number,
+                    'text': claim_text,
+                    'type': self._classify_claim_type(claim_lower, language),
+                    'word_count': len(claim_text.split()),
+                    'complexity_score': self._calculate_complexity(claim_text),
+                    '_lower': claim_lower
+                })
 
         # 如果沒有找到編號的權利要求，嘗試段落分割
         if not claims:
-            paragraphs = re.split(r'\n\s*\n', text)
+            paragraphs = _PARAGRAPH_SPLIT_RE.split(text)
             for i, para in enumerate(paragraphs):
-                if len(para.strip()) > 50 and self._looks_like_claim(para, language):
+                para_text = para.strip()
+                if len(para_text) <= 50:
+                    continue
+
+                para_lower = para_text.lower()
+                if self._looks_like_claim(para_lower, language):
                     claims.append({
                         'number': i + 1,
-                        'text': para.strip(),
-                        'type': self._classify_claim_type(para, language),
+                        'text': para_text,
+                        'type': self._classify_claim_type(para_lower, language),
                         'word_count': len(para.split()),
-                        'complexity_score': self._calculate_complexity(para)
+                        'complexity_score': self._calculate_complexity(para),
+                        '_lower': para_lower
                     })
 
         return sorted(claims, key=lambda x: x['number'])
 
-    def _classify_claim_type(self, claim_text: str, language: str) -> str:
-        """分類權利要求類型"""
-        claim_lower = claim_text.lower()
-
-        if language == 'zh':
-            if any(word in claim_lower for word in ['化合物', '分子', '物質']):
-                return 'product'
-            elif any(word in claim_lower for word in ['方法', '工藝', '步驟']):
-                return 'method'
-            elif any(word in claim_lower for word in ['用途', '應用', '治療']):
-                return 'use'
-            elif any(word in claim_lower for word in ['組成物', '製劑', '配方']):
-                return 'composition'
-        else:
-            if any(word in claim_lower for word in ['compound', 'molecule', 'substance']):
-                return 'product'
-            elif any(word in claim_lower for word in ['method', 'process', 'step']):
-                return 'method'
-            elif any(word in claim_lower for word in ['use', 'application', 'treatment']):
-                return 'use'
-            elif any(word in claim_lower for word in ['composition', 'formulation']):
-                return 'composition'
+    @staticmethod
+    def _public_claim(claim: Dict) -> Dict:
+        """去掉以下劃線開頭的內部字段（如小寫文本），得到返回給調用方的權利要求"""
+        return {key: value for key, value in claim.items() if not key.startswith('_')}
 
-        return 'other'
+    def _classify_claim_type(self, claim_lower: str, language: str) -> str:
+        """分類權利要求類型（參數為已轉小寫的權利要求文本）"""
+        matchers = _MATCHERS['zh' if language == 'zh' else 'en']
 
-    def _looks_like_claim(self, text: str, language: str) -> bool:
-        """判斷文本是否看起來像權利要求"""
-        # 檢查是否包含專利相關關鍵詞
-        text_lower = text.lower()
+        for claim_type in _CLAIM_TYPES:
+            if matchers[claim_type].contains_any(claim_lower):
+                return claim_type
 
-        if language == 'zh':
-            keywords = ['包含', '包括', '含有', '特徵在於', '其中']
-        else:
-            keywords = ['comprising', 'including', 'wherein', 'characterized']
+        return 'other'
 
-        return any(keyword in text_lower for keyword in keywords)
+    def _looks_like_claim(self, text_lower: str, language: str) -> bool:
+        """判斷文本是否看起來像權利要求（參數為已轉小寫的文本）"""
+        # 檢查是否包含專利相關關鍵詞
+        return _MATCHERS['zh' if language == 'zh' else 'en']['claim_like'].contains_any(text_lower)
 
     def _calculate_complexity(self, text: str) -> float:
         """計算權利要求複雜度"""
-        # 基於句子長度、從句數量、術語密度等計算
+        # 基於句子長度、從句數量、術語密度等計算；
+        # 句子數即句末標點數加一，直接計數，無需切分出句子列表
         words = len(text.split())
-        sentences = len(re.split(r'[.!?]', text))
+        sentences = text.count('.') + text.count('!') + text.count('?') + 1
         commas = text.count(',')
         semicolons = text.count(';')
         brackets = text.count('(') + text.count('[')
@@ -206,60 +323,76 @@ class PatentClaimsAnalyzer:
         complexity = (words / max(sentences, 1)) + commas * 0.1 + semicolons * 0.2 + brackets * 0.15
         return round(complexity, 2)
 
-    async def _analyze_claim_structure(self, claims: List[Dict], language: str) -> Dict:
-        """分析權利要求結構"""
-        structure = {
-            'independent_claims': [],
-            'dependent_claims': [],
-            'claim_types': Counter(),
-            'complexity_distribution': {},
-            'length_statistics': {}
-        }
+    def _collect_claim_stats(self, claims: List[Dict], language: str) -> Dict:
+        """
+        一次遍歷權利要求，匯總結構、覆蓋範圍、問題檢測與摘要共用的統計量
 
-        word_counts = []
-        complexity_scores = []
+        Returns:
+            包含類型計數、獨立/依賴權利要求編號、排序後詞數、複雜度列表的字典
+        """
+        types = Counter()
+        independent, dependent = [], []
+        word_counts, complexity_scores = [], []
 
         for claim in claims:
             # 判斷獨立/依賴權利要求
-            if self._is_dependent_claim(claim['text'], language):
-                structure['dependent_claims'].append(claim['number'])
+            if self._is_dependent_claim(claim['_lower'], language):
+                dependent.append(claim['number'])
             else:
-                structure['independent_claims'].append(claim['number'])
+                independent.append(claim['number'])
 
-            structure['claim_types'][claim['type']] += 1
+            types[claim['type']] += 1
             word_counts.append(claim['word_count'])
             complexity_scores.append(claim['complexity_score'])
 
-        # 統計信息
+        # 排序一次，最值與中位數直接按位置讀取
+        word_counts.sort()
+
+        return {
+            'total': len(claims),
+            'types': types,
+            'independent': independent,
+            'dependent': dependent,
+            'word_counts': word_counts,
+            'complexity_scores': complexity_scores,
+            'max_complexity': max(complexity_scores, default=0)
+        }
+
+    def _analyze_claim_structure(self, stats: Dict) -> Dict:
+        """分析權利要求結構"""
+        structure = {
+            'independent_claims': stats['independent'],
+            'dependent_claims': stats['dependent'],
+            'claim_types': stats['types'],
+            'complexity_distribution': {},
+            'length_statistics': {}
+        }
+
+        # 統計信息（中位數在偶數個時取較大者）
+        word_counts = stats['word_counts']
         if word_counts:
             structure['length_statistics'] = {
-                'min_words': min(word_counts),
-                'max_words': max(word_counts),
+                'min_words': word_counts[0],
+                'max_words': word_counts[-1],
                 'avg_words': round(sum(word_counts) / len(word_counts), 1),
-                'median_words': sorted(word_counts)[len(word_counts)//2]
+                'median_words': word_counts[len(word_counts)//2]
             }
 
+        complexity_scores = stats['complexity_scores']
         if complexity_scores:
             structure['complexity_distribution'] = {
                 'min_complexity': min(complexity_scores),
-                'max_complexity': max(complexity_scores),
+                'max_complexity': stats['max_complexity'],
                 'avg_complexity': round(sum(complexity_scores) / len(complexity_scores), 2)
             }
 
         return structure
 
-    def _is_dependent_claim(self, claim_text: str, language: str) -> bool:
-        """判斷是否為依賴權利要求"""
-        claim_lower = claim_text.lower()
-
-        if language == 'zh':
-            dependency_indicators = ['根據權利要求', '如權利要求', '依照權利要求']
-        else:
-            dependency_indicators = ['according to claim', 'as claimed in', 'of claim']
-
-        return any(indicator in claim_lower for indicator in dependency_indicators)
+    def _is_dependent_claim(self, claim_lower: str, language: str) -> bool:
+        """判斷是否為依賴權利要求（參數為已轉小寫的權利要求文本）"""
+        return _MATCHERS['zh' if language == 'zh' else 'en']['dependency'].contains_any(claim_lower)
 
-    async def _analyze_claim_dependencies(self, claims: List[Dict]) -> Dict:
+    def _analyze_claim_dependencies(self, claims: List[Dict]) -> Dict:
         """分析權利要求依賴關係"""
         dependencies = {
             'tree': {},
@@ -268,21 +401,17 @@ class PatentClaimsAnalyzer:
             'circular_dependencies': []
         }
 
-        claim_refs = {}
+        valid_nums = {c['number'] for c in claims}
 
         for claim in claims:
             claim_num = claim['number']
             dependencies['tree'][claim_num] = []
 
             # 查找依賴的權利要求編號
-            ref_pattern = r'權利要求\s*(\d+)|claim\s*(\d+)'
-            matches = re.findall(ref_pattern, claim['text'], re.IGNORECASE)
-
-            for match in matches:
-                ref_num = int(match[0] or match[1])
-                if ref_num != claim_num and ref_num in [c['number'] for c in claims]:
+            for match in _CLAIM_REF_RE.findall(claim['text']):
+                ref_num = int(match)
+                if ref_num != claim_num and ref_num in valid_nums:
                     dependencies['tree'][claim_num].append(ref_num)
-                    claim_refs[claim_num] = claim_refs.get(claim_num, []) + [ref_num]
 
         # 計算依賴層級
         dependencies['levels'] = self._calculate_dependency_levels(dependencies['tree'])
@@ -293,115 +422,106 @@ class PatentClaimsAnalyzer:
         return dependencies
 
     def _calculate_dependency_levels(self, tree: Dict) -> Dict:
-        """計算依賴層級"""
-        levels = {}
-
-        def get_level(claim_num, visited=None):
-            if visited is None:
-                visited = set()
-
-            if claim_num in visited:
-                return float('inf')  # 循環依賴
-
-            if claim_num in levels:
-                return levels[claim_num]
-
-            deps = tree.get(claim_num, [])
-            if not deps:
-                levels[claim_num] = 0
-                return 0
-
-            visited.add(claim_num)
-            max_dep_level = max(get_level(dep, visited.copy()) for dep in deps)
-            levels[claim_num] = max_dep_level + 1 if max_dep_level != float('inf') else float('inf')
-
-            return levels[claim_num]
+        """
+        計算依賴層級（按入度的拓撲排序逐層推進，不遞歸）
 
-        for claim_num in tree:
-            get_level(claim_num)
+        獨立權利要求為0層，從屬權利要求比其依賴的最深一項多一層；
+        處於循環依賴中或依賴循環的權利要求無法排序，層級為無窮大。
+        """
+        levels = dict.fromkeys(tree, 0)
+        pending = {}  # 尚未確定層級的被依賴項數
+        dependents = defaultdict(list)
+
+        for claim_num, deps in tree.items():
+            deps = set(deps)
+            pending[claim_num] = len(deps)
+            for dep in deps:
+                dependents[dep].append(claim_num)
+
+        queue = deque(claim_num for claim_num, count in pending.items() if count == 0)
+        while queue:
+            dep = queue.popleft()
+            for claim_num in dependents[dep]:
+                levels[claim_num] = max(levels[claim_num], levels[dep] + 1)
+                pending[claim_num] -= 1
+                if pending[claim_num] == 0:
+                    queue.append(claim_num)
+
+        for claim_num, count in pending.items():
+            if count:
+                levels[claim_num] = float('inf')  # 循環依賴
 
         return levels
 
     def _detect_circular_dependencies(self, tree: Dict) -> List[List[int]]:
-        """檢測循環依賴"""
+        """檢測循環依賴（顯式棧迭代DFS）"""
         visited = set()
-        rec_stack = set()
         cycles = []
 
-        def dfs(node, path):
-            visited.add(node)
-            rec_stack.add(node)
-            path.append(node)
-
-            for neighbor in tree.get(node, []):
-                if neighbor not in visited:
-                    dfs(neighbor, path.copy())
-                elif neighbor in rec_stack:
+        for root in tree:
+            if root in visited:
+                continue
+
+            # path為當前DFS路徑，pos記錄路徑上各節點的位置（即遞歸棧）
+            path = [root]
+            pos = {root: 0}
+            stack = [iter(tree.get(root, ()))]
+            visited.add(root)
+
+            while stack:
+                neighbor = next(stack[-1], None)
+
+                if neighbor is None:
+                    # 當前節點的子節點已遍歷完，出棧
+                    stack.pop()
+                    del pos[path.pop()]
+                elif neighbor not in visited:
+                    visited.add(neighbor)
+                    pos[neighbor] = len(path)
+                    path.append(neighbor)
+                    stack.append(iter(tree.get(neighbor, ())))
+                elif neighbor in pos:
                     # 找到循環
-                    cycle_start = path.index(neighbor)
-                    cycles.append(path[cycle_start:] + [neighbor])
-
-            rec_stack.remove(node)
-
-        for node in tree:
-            if node not in visited:
-                dfs(node, [])
+                    cycles.append(path[pos[neighbor]:] + [neighbor])
 
         return cycles
 
-    async def _extract_technical_features(self, claims: List[Dict], language: str) -> Dict:
+    def _extract_technical_features(self, claims: List[Dict], language: str) -> Dict:
         """提取技術特徵"""
+        # 各類特徵以集合邊收集邊去重
         features = {
-            'chemical_entities': [],
-            'processes': [],
-            'compositions': [],
-            'parameters': [],
-            'functional_groups': []
+            'chemical_entities': set(),
+            'processes': set(),
+            'compositions': set(),
+            'parameters': set(),
+            'functional_groups': set()
         }
 
         all_text = ' '.join([claim['text'] for claim in claims])
 
         # 提取化學實體
-        chemical_patterns = [
-            r'[A-Z][a-z]?\d*(?:[A-Z][a-z]?\d*)*',  # 分子式
-            r'\b\w*(?:化合物|compound|molecule)\w*\b',  # 化合物相關
-            r'\b\w*(?:基團|group|radical)\w*\b'  # 基團相關
-        ]
-
-        for pattern in chemical_patterns:
-            matches = re.findall(pattern, all_text, re.IGNORECASE)
-            features['chemical_entities'].extend(matches)
+        for pattern in _CHEMICAL_PATTERNS:
+            features['chemical_entities'].update(pattern.findall(all_text))
 
         # 提取工藝參數
-        parameter_patterns = [
-            r'(\d+(?:\.\d+)?)\s*(?:℃|°C|度)',  # 溫度
-            r'(\d+(?:\.\d+)?)\s*(?:小時|h|hour)',  # 時間
-            r'(\d+(?:\.\d+)?)\s*(?:%|百分比|percent)',  # 百分比
-            r'(\d+(?:\.\d+)?)\s*(?:MPa|Pa|壓力)',  # 壓力
-        ]
-
-        for pattern in parameter_patterns:
-            matches = re.findall(pattern, all_text, re.IGNORECASE)
-            features['parameters'].extend(matches)
-
-        # 使用NLP提取更複雜的特徵
-        if language in self.nlp_models:
-            nlp = self.nlp_models[language]
-            doc = nlp(all_text[:1000000])  # 限制文本長度以提高性能
+        for pattern in _PARAMETER_PATTERNS:
+            features['parameters'].update(pattern.findall(all_text))
+
+        # 使用NLP提取更複雜的特徵：僅將產品、組合物、用途類權利要求批量送入管線
+        nlp = self._get_nlp_model(language)
+        if nlp is not None:
+            texts = [claim['text'] for claim in claims if claim['type'] in _NER_CLAIM_TYPES]
 
             # 提取命名實體
-            for ent in doc.ents:
-                if ent.label_ in ['PRODUCT', 'ORG', 'PERSON']:
+            for doc in nlp.pipe(texts, batch_size=settings.SPACY_BATCH_SIZE):
+                for ent in doc.ents:
                     if ent.label_ == 'PRODUCT':
-                        features['chemical_entities'].append(ent.text)
-
-        # 去重並清理
-        for key in features:
-            features[key] = list(set(filter(None, features[key])))
+                        features['chemical_entities'].add(ent.text)
 
-        return features
+        # 清理空匹配
+        return {key: [value for value in values if value] for key, values in features.items()}
 
-    async def _identify_innovations(self, claims: List[Dict], language: str) -> Dict:
+    def _identify_innovations(self, claims: List[Dict], language: str) -> Dict:
         """識別創新點"""
         innovations = {
             'novel_features': [],
@@ -411,64 +531,54 @@ class PatentClaimsAnalyzer:
         }
 
         # 創新關鍵詞
-        if language == 'zh':
-            innovation_keywords = [
-                '新穎', '創新', '改進', '優化', '突破', '首次',
-                '顯著', '明顯', '更好', '提高', '增強', '減少'
-            ]
-            advantage_keywords = [
-                '優點', '優勢', '有益效果', '技術效果', '改善', '提升'
-            ]
-        else:
-            innovation_keywords = [
-                'novel', 'innovative', 'improved', 'enhanced', 'new',
-                'significantly', 'substantially', 'better', 'superior'
-            ]
-            advantage_keywords = [
-                'advantage', 'benefit', 'improvement', 'enhancement', 'effect'
-            ]
+        matchers = _MATCHERS['zh' if language == 'zh' else 'en']
 
         innovation_score = 0
 
         for claim in claims:
-            text_lower = claim['text'].lower()
+            text_lower = claim['_lower']
 
             # 檢測創新特徵
-            for keyword in innovation_keywords:
-                if keyword in text_lower:
-                    innovations['novel_features'].append({
-                        'claim': claim['number'],
-                        'keyword': keyword,
-                        'context': self._extract_context(claim['text'], keyword)
-                    })
-                    innovation_score += 1
+            for keyword, start in matchers['innovation'].find_all(text_lower):
+                innovations['novel_features'].append({
+                    'claim': claim['number'],
+                    'keyword': keyword,
+                    'context': self._extract_context(claim['text'], text_lower, keyword, start)
+                })
+                innovation_score += 1
 
             # 檢測技術優勢
-            for keyword in advantage_keywords:
-                if keyword in text_lower:
-                    innovations['technical_advantages'].append({
-                        'claim': claim['number'],
-                        'keyword': keyword,
-                        'context': self._extract_context(claim['text'], keyword)
-                    })
-                    innovation_score += 0.5
+            for keyword, start in matchers['advantage'].find_all(text_lower):
+                innovations['technical_advantages'].append({
+                    'claim': claim['number'],
+                    'keyword': keyword,
+                    'context': self._extract_context(claim['text'], text_lower, keyword, start)
+                })
+                innovation_score += 0.5
 
         innovations['innovation_score'] = round(innovation_score / max(len(claims), 1), 2)
 
         return innovations
 
-    def _extract_context(self, text: str, keyword: str, window: int = 50) -> str:
-        """提取關鍵詞上下文"""
-        keyword_pos = text.lower().find(keyword.lower())
-        if keyword_pos == -1:
-            return ""
+    def _extract_context(self, text: str, text_lower: str, keyword: str, start: int, window: int = 50) -> str:
+        """
+        提取關鍵詞上下文
 
-        start = max(0, keyword_pos - window)
-        end = min(len(text), keyword_pos + len(keyword) + window)
+        start為在text_lower中掃描得到的位置。lower()逐字符轉換時（長度不變）
+        位置與原文一致，可直接切片；個別字符（如'İ'）轉小寫後變長時位置會錯位，
+        此時在原文中忽略大小寫重新查找關鍵詞。
+        """
+        if len(text_lower) != len(text):
+            match = re.search(re.escape(keyword), text, re.IGNORECASE)
+            if match is None:
+                return ""
+            start, end = match.span()
+        else:
+            end = start + len(keyword)
 
-        return text[start:end].strip()
+        return text[max(0, start - window):min(len(text), end + window)].strip()
 
-    async def _analyze_coverage_scope(self, claims: List[Dict]) -> Dict:
+    def _analyze_coverage_scope(self, stats: Dict) -> Dict:
         """分析覆蓋範圍"""
         scope = {
             'breadth_score': 0.0,
@@ -478,20 +588,17 @@ class PatentClaimsAnalyzer:
         }
 
         # 計算廣度分數（基於權利要求類型的多樣性）
-        claim_types = set(claim['type'] for claim in claims)
-        scope['breadth_score'] = len(claim_types) / 4.0  # 假設最多4種類型
+        scope['breadth_score'] = len(stats['types']) / 4.0  # 假設最多4種類型
 
         # 計算深度分數（基於依賴權利要求的層次）
-        max_complexity = max((claim['complexity_score'] for claim in claims), default=0)
-        scope['depth_score'] = min(max_complexity / 20.0, 1.0)  # 標準化到0-1
+        scope['depth_score'] = min(stats['max_complexity'] / 20.0, 1.0)  # 標準化到0-1
 
         # 識別保護領域
-        protection_areas = Counter(claim['type'] for claim in claims)
-        scope['protection_areas'] = dict(protection_areas)
+        scope['protection_areas'] = dict(stats['types'])
 
         return scope
 
-    async def _detect_potential_issues(self, claims: List[Dict], language: str) -> List[Dict]:
+    def _detect_potential_issues(self, claims: List[Dict], stats: Dict) -> List[Dict]:
         """檢測潛在問題"""
         issues = []
 
@@ -516,7 +623,7 @@ class PatentClaimsAnalyzer:
                 })
 
         # 檢查獨立權利要求數量
-        independent_count = len([c for c in claims if not self._is_dependent_claim(c['text'], language)])
+        independent_count = len(stats['independent'])
         if independent_count == 0:
             issues.append({
                 'type': 'structure_error',
@@ -532,7 +639,7 @@ class PatentClaimsAnalyzer:
 
         return issues
 
-    async def _generate_suggestions(self, claims: List[Dict], issues: List[Dict]) -> List[str]:
+    def _generate_suggestions(self, claims: List[Dict], stats: Dict, issues: List[Dict]) -> List[str]:
         """生成改進建議"""
         suggestions = []
 
@@ -550,31 +657,45 @@ class PatentClaimsAnalyzer:
             suggestions.append("考慮增加更多依賴權利要求以擴大保護範圍")
 
         # 檢查權利要求類型分布
-        claim_types = Counter(claim['type'] for claim in claims)
-        if len(claim_types) == 1:
+        if len(stats['types']) == 1:
             suggestions.append("考慮添加不同類型的權利要求（如方法、用途等）以全面保護發明")
 
         return list(set(suggestions))
 
-    def _generate_summary(self, claims: List[Dict], features: Dict, innovations: Dict) -> Dict:
+    def _generate_summary(self, stats: Dict, features: Dict, innovations: Dict) -> Dict:
         """生成分析摘要"""
+        types = stats['types']
         return {
-            'total_claims': len(claims),
-            'independent_claims': len([c for c in claims if c['type'] != 'dependent']),
-            'main_protection_type': Counter(c['type'] for c in claims).most_common(1)[0][0] if claims else 'unknown',
+            'total_claims': stats['total'],
+            'independent_claims': stats['total'] - types['dependent'],
+            # 計數相同時取先出現的類型，與Counter.most_common一致
+            'main_protection_type': max(types, key=types.__getitem__) if types else 'unknown',
             'innovation_level': 'high' if innovations['innovation_score'] > 0.5 else 'medium' if innovations['innovation_score'] > 0.2 else 'low',
-            'technical_complexity': 'high' if any(c['complexity_score'] > 10 for c in claims) else 'medium',
+            'technical_complexity': 'high' if stats['max_complexity'] > 10 else 'medium',
             'key_features_count': len(features['chemical_entities']) + len(features['processes'])
         }
 
     def _detect_language(self, text: str) -> str:
         """檢測文本語言"""
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
         total_chars = len(text)
 
+        if total_chars < _VECTORIZE_MIN_CHARS:
+            chinese_chars = len(_CHINESE_CHAR_RE.findall(text))
+        else:
+            # 碼點減去區間起點後按無符號數比較，區間外的值回繞為大數，一次比較即可
+            codepoints = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+            chinese_chars = int(np.count_nonzero((codepoints - _CJK_FIRST) < _CJK_SPAN))
+
         if chinese_chars / max(total_chars, 1) > 0.1:
             return 'zh'
         return 'en'
 
-# 創建全局實例
-patent_analyzer = PatentClaimsAnalyzer()
+# 全局實例：首次調用時創建，導入模塊時不加載spaCy
+@functools.lru_cache(maxsize=1)
+def get_patent_analyzer() -> PatentClaimsAnalyzer:
+    """返回全局專利權利要求分析器"""
+    return PatentClaimsAnalyzer()
+
+def analyze_patent_claims_sync(text: str, language: str = 'auto') -> Dict:
+    """同步分析入口，供進程池調用"""
+    return asyncio.run(get_patent_analyzer().analyze_patent_claims(text, language))
@@ -1,17 +1,308 @@
 
 import io
+import os
+import asyncio
 import fitz  # PyMuPDF
 import pytesseract
-from PIL import Image
 import pdfplumber
-import PyPDF2
-from pdf2image import convert_from_bytes
 import cv2
 import numpy as np
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple, Union
 import re
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager, nullcontext
 from loguru import logger
 
+try:
+    from tesserocr import PyTessBaseAPI, PSM, RIL, iterate_level
+    TESSEROCR_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    TESSEROCR_AVAILABLE = False
+
+from app.core.config import settings
+
+# PDF來源：文件內容（bytes）或磁盤路徑
+PDFSource = Union[bytes, str, os.PathLike]
+
+def _is_path(pdf_source: PDFSource) -> bool:
+    """判斷PDF來源是否為文件路徑"""
+    return isinstance(pdf_source, (str, os.PathLike))
+
+def _as_file(pdf_source: PDFSource):
+    """轉換為pdfplumber可接受的路徑或文件對象"""
+    return pdf_source if _is_path(pdf_source) else io.BytesIO(pdf_source)
+
+def _open_fitz(pdf_source: PDFSource) -> fitz.Document:
+    """以PyMuPDF打開PDF，路徑來源不會整體讀入內存"""
+    if _is_path(pdf_source):
+        return fitz.open(pdf_source, filetype="pdf")
+    return fitz.open(stream=pdf_source, filetype="pdf")
+
+def _ocr_workers() -> int:
+    """
+    OCR並行度：不超過配置上限及機器CPU核心數
+
+    按整機核心數而非當前進程的CPU親和性計算：開啟PIN_WORKER_CPUS時工作進程
+    只綁定一個核心，按親和性計算會使並行識別退化為單線程。
+    """
+    return max(1, min(settings.OCR_MAX_WORKERS, os.cpu_count() or 1))
+
+# OCR光柵化分辨率（可通過OCR_DPI配置）
+OCR_DPI = settings.OCR_DPI
+
+# 光柵化圖像長邊上限（像素）：A4頁面按300dpi約3500像素不受影響，
+# 更大幅面的頁面（A3、工程圖）按比例降低分辨率，避免生成超大圖像
+_OCR_MAX_EDGE = 4000
+
+# 使用的PyMuPDF元數據鍵；首字母大寫即為PDF文檔信息字典（pdfplumber）中的鍵
+_FITZ_METADATA_KEYS = ('title', 'author', 'subject', 'creator', 'producer', 'creationDate', 'modDate')
+
+# 非空白字符不超過此數的頁面視為缺少文本層（掃描頁、附圖頁），需要OCR補充
+_MIN_PAGE_CHARS = 40
+
+# 有文本的頁面佔比達到此值即接受文本層提取結果，不再嘗試其他文本層方法
+_MIN_TEXT_COVERAGE = 0.2
+
+# 文檔結構與語言檢測使用的正則，模塊加載時編譯一次
+_HEADING_NUM_RE = re.compile(r'^\d+\.?\s+.+')  # 數字編號標題
+_HEADING_CAP_RE = re.compile(r'^[A-Z][^.!?]*$')  # 首字母大寫且無句末標點的標題
+_PARA_SPLIT_RE = re.compile(r'\n\s*\n')
+# 引用格式合併為單個交替式，一次掃描；作者名錨定在詞首，避免在詞內逐位置回溯
+_REF_RE = re.compile(
+    r'\[\d+\]'  # [1]
+    r'|\(\d+\)'  # (1)
+    r'|\b\w+\s+et\s+al\.?,?\s+\d{4}'  # Author et al., 2023
+)
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]')
+_JP_RE = re.compile(r'[\u3040-\u309f\u30a0-\u30ff]')
+
+# 長文本按UTF-32碼點向量化計數的區間（起點, 長度）及啟用閾值
+_CJK_FIRST, _CJK_SPAN = np.uint32(0x4e00), 0x9fff - 0x4e00 + 1
+_KANA_FIRST, _KANA_SPAN = np.uint32(0x3040), 0x30ff - 0x3040 + 1
+_VECTORIZE_MIN_CHARS = 256
+
+def _count_scripts(text: str) -> Tuple[int, int]:
+    """統計文本中的中文字符與日文假名數量"""
+    if len(text) < _VECTORIZE_MIN_CHARS:
+        return len(_CJK_RE.findall(text)), len(_JP_RE.findall(text))
+
+    # 碼點減去區間起點後按無符號數比較，區間外的值回繞為大數，一次比較即可
+    codepoints = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    return (
+        int(np.count_nonzero((codepoints - _CJK_FIRST) < _CJK_SPAN)),
+        int(np.count_nonzero((codepoints - _KANA_FIRST) < _KANA_SPAN))
+    )
+
+def _is_sparse_page(page: Dict) -> bool:
+    """頁面提取到的文本是否過少"""
+    return len(page.get('text', '').strip()) <= _MIN_PAGE_CHARS
+
+def _text_coverage(pages: List[Dict]) -> float:
+    """有足夠文本的頁面佔比"""
+    return sum(1 for page in pages if not _is_sparse_page(page)) / max(len(pages), 1)
+
+def _rasterize_pages(
+    pdf_doc: fitz.Document,
+    page_indices: Optional[List[int]] = None,
+    dpi: int = OCR_DPI
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    以PyMuPDF逐頁光柵化為灰度圖，不一次性保留全部頁面
+
+    Args:
+        pdf_doc: 已打開的PyMuPDF文檔
+        page_indices: 需要光柵化的頁面索引（從0開始），默認全部頁面
+
+    Returns:
+        (頁面索引, (H, W)的灰度數組)迭代器
+    """
+    for index in (range(pdf_doc.page_count) if page_indices is None else page_indices):
+        page = pdf_doc[index]
+        # 直接按縮放後的尺寸渲染，無需先渲染原尺寸再縮小；
+        # 直接渲染單通道灰度，省去RGB轉灰度的整圖遍歷，像素數據也只有三分之一
+        zoom = min(dpi / 72, _OCR_MAX_EDGE / max(page.rect.width, page.rect.height, 1))
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+        image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        # samples已複製為bytes，交出數組前先釋放Pixmap的原生緩衝區，
+        # 避免生成器掛起期間同時持有兩份整頁像素
+        pix = None
+        yield index, image
+
+# 乾淨頁面判定：抽樣像素中，與純黑/純白相差超過_CLEAN_TOLERANCE的中間色調
+# 佔比不超過_CLEAN_MAX_MIDTONE（向量頁面只有文字邊緣的抗鋸齒像素；
+# 掃描件的紙張底色與噪聲使中間色調佔絕大多數）
+_CLEAN_TOLERANCE = 8
+_CLEAN_MAX_MIDTONE = 0.05
+_CLEAN_SAMPLE_STEP = 8
+
+def _is_clean_render(gray: np.ndarray) -> bool:
+    """灰度圖是否為無噪聲的向量渲染頁面（每8行8列抽樣一個像素估計）"""
+    sample = gray[::_CLEAN_SAMPLE_STEP, ::_CLEAN_SAMPLE_STEP]
+    midtone = np.count_nonzero((sample > _CLEAN_TOLERANCE) & (sample < 255 - _CLEAN_TOLERANCE))
+    return midtone <= _CLEAN_MAX_MIDTONE * sample.size
+
+def _preprocess_image(gray: np.ndarray) -> np.ndarray:
+    """圖像預處理以提高OCR準確性（輸入為光柵化得到的灰度圖）"""
+    # 去噪（乾淨的向量渲染頁面無需去噪）
+    denoised = gray if _is_clean_render(gray) else cv2.medianBlur(gray, 3)
+
+    # 二值化
+    _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    return thresh
+
+# 單詞級識別數據的字段，與pytesseract.image_to_data(output_type=DICT)一致
+_OCR_DATA_KEYS = (
+    'level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+    'left', 'top', 'width', 'height', 'conf', 'text'
+)
+
+class _TesseractAPIs:
+    """
+    tesserocr識別引擎池
+
+    引擎在進程內加載語言模型，同一文檔的各頁共用；每個線程同一時刻獨佔一個引擎，
+    引擎數隨並發頁數按需增加，文檔處理完畢後統一釋放。
+    """
+
+    def __init__(self, lang_code: str):
+        self.lang_code = lang_code
+        self._idle = queue.SimpleQueue()
+        self._apis = []
+
+    @contextmanager
+    def acquire(self):
+        """取出一個空閒引擎，沒有時新建"""
+        try:
+            api = self._idle.get_nowait()
+        except queue.Empty:
+            api = PyTessBaseAPI(lang=self.lang_code, psm=PSM.SINGLE_BLOCK)
+            self._apis.append(api)
+
+        try:
+            yield api
+        finally:
+            self._idle.put(api)
+
+    def close(self):
+        """釋放全部引擎"""
+        for api in self._apis:
+            api.End()
+        self._apis.clear()
+
+def _tesserocr_data(api) -> Dict[str, list]:
+    """遍歷識別結果收集單詞級位置、置信度與文本，無需再次識別"""
+    data = {key: [] for key in _OCR_DATA_KEYS}
+    iterator = api.GetIterator()
+    if iterator is None:
+        return data
+
+    block = par = line = word = 0
+    for result in iterate_level(iterator, RIL.WORD):
+        if result.IsAtBeginningOf(RIL.BLOCK):
+            block, par = block + 1, 0
+        if result.IsAtBeginningOf(RIL.PARA):
+            par, line = par + 1, 0
+        if result.IsAtBeginningOf(RIL.TEXTLINE):
+            line, word = line + 1, 0
+        word += 1
+
+        box = result.BoundingBox(RIL.WORD)
+        if box is None:
+            continue
+
+        left, top, right, bottom = box
+        for key, value in zip(_OCR_DATA_KEYS, (
+            5, 1, block, par, line, word, left, top, right - left, bottom - top,
+            result.Confidence(RIL.WORD), result.GetUTF8Text(RIL.WORD)
+        )):
+            data[key].append(value)
+
+    return data
+
+def _text_from_ocr_data(data: Dict[str, list]) -> str:
+    """
+    由單詞級識別數據重建純文本
+
+    同一行的單詞以空格連接，行之間換行，段落之間空一行（與tesseract文本輸出一致）
+    """
+    paragraphs = []
+    lines = []
+    words = []
+    current_par = current_line = None
+
+    for block, par, line, conf, text in zip(
+        data['block_num'], data['par_num'], data['line_num'], data['conf'], data['text']
+    ):
+        # 非單詞層級的條目置信度為-1，文本為空
+        if float(conf) < 0 or not text.strip():
+            continue
+
+        if (block, par, line) != current_line:
+            if words:
+                lines.append(' '.join(words))
+                words = []
+            if (block, par) != current_par and lines:
+                paragraphs.append('\n'.join(lines))
+                lines = []
+            current_par, current_line = (block, par), (block, par, line)
+
+        words.append(text)
+
+    if words:
+        lines.append(' '.join(words))
+    if lines:
+        paragraphs.append('\n'.join(lines))
+
+    return '\n\n'.join(paragraphs) + '\n' if paragraphs else ''
+
+def _ocr_one_page(
+    index: int,
+    image: np.ndarray,
+    lang_code: str,
+    apis: Optional[_TesseractAPIs] = None
+) -> Dict:
+    """對單頁圖像進行預處理與OCR識別，返回頁面字典"""
+    # 圖像預處理
+    processed_image = _preprocess_image(image)
+
+    # OCR識別
+    try:
+        if apis is not None:
+            # 進程內識別一次，文本與單詞級數據均取自同一結果
+            with apis.acquire() as api:
+                # 直接傳入單通道灰度緩衝區（每像素1字節），不經PIL圖像中轉
+                height, width = processed_image.shape
+                api.SetImageBytes(processed_image.tobytes(), width, height, 1, width)
+                text = api.GetUTF8Text()
+                data = _tesserocr_data(api)
+        else:
+            # 只調用一次tesseract，純文本由單詞級數據重建
+            data = pytesseract.image_to_data(
+                processed_image, 
+                lang=lang_code, 
+                config='--psm 6',
+                output_type=pytesseract.Output.DICT
+            )
+            text = _text_from_ocr_data(data)
+
+        return {
+            'page_number': index + 1,
+            'text': text,
+            'ocr_data': data,
+            'image_size': (image.shape[1], image.shape[0])
+        }
+
+    except Exception as e:
+        logger.error(f"OCR識別第{index+1}頁失敗: {str(e)}")
+        return {
+            'page_number': index + 1,
+            'text': "",
+            'error': str(e)
+        }
+
 class MultilingualPDFParser:
     """多語言PDF解析器，支持中文、英文、日文"""
 
@@ -23,31 +314,36 @@ class MultilingualPDFParser:
             'auto': 'chi_sim+chi_tra+eng+jpn'  # 自動檢測
         }
 
-    async def parse_pdf(self, pdf_content: bytes, language: str = 'auto') -> Dict:
+    async def parse_pdf(self, pdf_content: PDFSource, language: str = 'auto') -> Dict:
         """
         解析PDF文檔
 
         Args:
-            pdf_content: PDF文件內容（bytes）
+            pdf_content: PDF文件內容（bytes）或臨時文件路徑
             language: 語言代碼 ('zh', 'en', 'ja', 'auto')
 
         Returns:
             解析結果字典
         """
+        pdf_doc = None
         try:
             logger.info(f"開始解析PDF，語言設置: {language}")
 
+            # PyMuPDF文檔只打開一次，文本提取、OCR光柵化與元數據共用；
+            # PyMuPDF無法打開時仍以pdfplumber提取文本與元數據（無法OCR）
+            try:
+                pdf_doc = _open_fitz(pdf_content)
+            except Exception as e:
+                logger.warning(f"PyMuPDF無法打開PDF，改用pdfplumber解析: {str(e)}")
+
             # 嘗試多種解析方法
-            text_content = await self._extract_text_multi_method(pdf_content, language)
+            text_content = await self._extract_text_multi_method(pdf_content, pdf_doc, language)
 
             # 提取元數據
-            metadata = await self._extract_metadata(pdf_content)
-
-            # 分析文檔結構
-            structure = await self._analyze_document_structure(text_content)
+            metadata = self._extract_metadata(pdf_content, pdf_doc)
 
-            # 檢測語言
-            detected_language = await self._detect_language(text_content)
+            # 分析文檔結構並檢測語言（單次遍歷頁面）
+            structure, detected_language = self._analyze_pages(text_content.get('pages', []))
 
             result = {
                 'text_content': text_content,
@@ -65,38 +361,90 @@ class MultilingualPDFParser:
             logger.error(f"PDF解析失败: {str(e)}")
             raise
 
-    async def _extract_text_multi_method(self, pdf_content: bytes, language: str) -> Dict:
-        """使用多種方法提取文本"""
-        methods = [
-            ('pdfplumber', self._extract_with_pdfplumber),
-            ('pymupdf', self._extract_with_pymupdf),
-            ('ocr', lambda content, lang: self._extract_with_ocr(content, lang))
-        ]
+        finally:
+            if pdf_doc is not None:
+                pdf_doc.close()
 
-        for method_name, method_func in methods:
-            try:
-                logger.info(f"嘗試使用{method_name}提取文本")
-                if method_name == 'ocr':
-                    result = await method_func(pdf_content, language)
-                else:
-                    result = await method_func(pdf_content)
+    async def _extract_text_multi_method(
+        self,
+        pdf_content: PDFSource,
+        pdf_doc: Optional[fitz.Document],
+        language: str
+    ) -> Dict:
+        """
+        使用多種方法提取文本
 
-                if result and result.get('pages'):
-                    result['method'] = method_name
-                    logger.success(f"使用{method_name}成功提取文本")
-                    return result
+        文本層方法按順序嘗試，有文本的頁面佔比足夠即停止；其中文本過少的頁面
+        再單獨以OCR識別並合併，文本層方法均失敗時對全部頁面OCR。
+        PyMuPDF未能打開文檔（pdf_doc為None）時只使用pdfplumber，不進行OCR。
+        """
+        methods = [('pdfplumber', self._extract_with_pdfplumber, pdf_content)]
+        if pdf_doc is not None:
+            methods.append(('pymupdf', self._extract_with_pymupdf, pdf_doc))
 
+        result = None
+        best_coverage = -1.0
+        for method_name, method_func, source in methods:
+            try:
+                logger.debug(f"嘗試使用{method_name}提取文本")
+                candidate = await method_func(source)
             except Exception as e:
                 logger.warning(f"{method_name}提取失败: {str(e)}")
                 continue
 
-        raise Exception("所有文本提取方法都失败")
+            if not candidate or not candidate.get('pages'):
+                continue
+
+            candidate['method'] = method_name
+            coverage = _text_coverage(candidate['pages'])
+            if coverage > best_coverage:
+                result, best_coverage = candidate, coverage
 
-    async def _extract_with_pdfplumber(self, pdf_content: bytes) -> Dict:
+            if coverage >= _MIN_TEXT_COVERAGE:
+                break
+
+        # 僅對文本過少的頁面進行OCR；沒有任何文本層結果時識別全部頁面
+        sparse = None if result is None else [
+            i for i, page in enumerate(result['pages']) if _is_sparse_page(page)
+        ]
+
+        if pdf_doc is not None and (sparse is None or sparse):
+            try:
+                logger.debug(f"嘗試使用ocr提取文本（{'全部' if sparse is None else len(sparse)}頁）")
+                ocr_result = await self._extract_with_ocr(pdf_doc, language, sparse)
+
+                if result is None:
+                    if ocr_result.get('pages'):
+                        result = {**ocr_result, 'method': 'ocr'}
+                elif self._merge_ocr_pages(result['pages'], sparse, ocr_result['pages']):
+                    result['method'] += '+ocr'
+
+            except Exception as e:
+                logger.warning(f"ocr提取失败: {str(e)}")
+
+        if result is None:
+            raise Exception("所有文本提取方法都失败")
+
+        logger.success(f"使用{result['method']}成功提取文本")
+        return result
+
+    @staticmethod
+    def _merge_ocr_pages(pages: List[Dict], indices: List[int], ocr_pages: List[Dict]) -> bool:
+        """OCR識別出更多文本時替換對應頁面的文本，返回是否有頁面被替換"""
+        merged = False
+        for index, ocr_page in zip(indices, ocr_pages):
+            text = ocr_page.get('text', '')
+            if len(text.strip()) > len(pages[index].get('text', '').strip()):
+                pages[index]['text'] = text
+                pages[index]['ocr_data'] = ocr_page.get('ocr_data')
+                merged = True
+        return merged
+
+    async def _extract_with_pdfplumber(self, pdf_content: PDFSource) -> Dict:
         """使用pdfplumber提取文本"""
         pages = []
 
-        with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
+        with pdfplumber.open(_as_file(pdf_content)) as pdf:
             for i, page in enumerate(pdf.pages):
                 page_text = page.extract_text() or ""
 
@@ -113,34 +461,32 @@ class MultilingualPDFParser:
                     'bbox': page.bbox if hasattr(page, 'bbox') else None
                 })
 
+                # 釋放本頁緩存的字符與版面對象，內存不隨已處理頁數增長
+                page.flush_cache()
+
         return {'pages': pages}
 
-    async def _extract_with_pymupdf(self, pdf_content: bytes) -> Dict:
+    async def _extract_with_pymupdf(self, pdf_doc: fitz.Document) -> Dict:
         """使用PyMuPDF提取文本"""
         pages = []
 
-        pdf_doc = fitz.open(stream=pdf_content, filetype="pdf")
-
         for page_num in range(pdf_doc.page_count):
             page = pdf_doc[page_num]
 
             # 提取文本
             text = page.get_text()
 
-            # 提取圖像
+            # 記錄圖像位置信息；不解碼、不保存像素數據，需要時可按xref從文檔讀取
             images = []
-            for img_index, img in enumerate(page.get_images()):
+            for img_index, img in enumerate(page.get_images(full=True)):
                 try:
-                    xref = img[0]
-                    pix = fitz.Pixmap(pdf_doc, xref)
-                    if pix.n - pix.alpha < 4:  # 確保是RGB或灰度圖像
-                        img_data = pix.tobytes("png")
-                        images.append({
-                            'index': img_index,
-                            'data': img_data,
-                            'bbox': page.get_image_bbox(img)
-                        })
-                    pix = None
+                    images.append({
+                        'index': img_index,
+                        'xref': img[0],
+                        'width': img[2],
+                        'height': img[3],
+                        'bbox': tuple(page.get_image_bbox(img))
+                    })
                 except Exception as e:
                     logger.warning(f"提取圖像失敗: {str(e)}")
 
@@ -148,100 +494,72 @@ class MultilingualPDFParser:
                 'page_number': page_num + 1,
                 'text': text,
                 'images': images,
-                'bbox': page.rect
+                'bbox': tuple(page.rect)
             })
 
-        pdf_doc.close()
         return {'pages': pages}
 
-    async def _extract_with_ocr(self, pdf_content: bytes, language: str) -> Dict:
-        """使用OCR提取文本"""
-        pages = []
-
-        # 轉換PDF為圖像
-        images = convert_from_bytes(pdf_content, dpi=300)
-
+    async def _extract_with_ocr(
+        self,
+        pdf_doc: fitz.Document,
+        language: str,
+        page_indices: Optional[List[int]] = None
+    ) -> Dict:
+        """使用OCR提取文本（可只識別指定頁面，頁面索引從0開始）"""
+        workers = _ocr_workers()
         lang_code = self.supported_languages.get(language, 'eng')
 
-        for i, image in enumerate(images):
-            # 圖像預處理
-            processed_image = await self._preprocess_image(image)
+        # 光柵化在當前線程中逐頁進行，識別在線程池中並行：預處理由OpenCV完成、
+        # 識別由tesserocr（未安裝時為tesseract子進程）完成，均不佔用GIL。
+        # 同時處理的頁數不超過線程數，內存中只保留少量頁面圖像；結果按頁序收集
+        engines = closing(_TesseractAPIs(lang_code)) if TESSEROCR_AVAILABLE else nullcontext()
 
-            # OCR識別
-            try:
-                text = pytesseract.image_to_string(
-                    processed_image, 
-                    lang=lang_code,
-                    config='--psm 6'
-                )
-
-                # 獲取詳細信息
-                data = pytesseract.image_to_data(
-                    processed_image, 
-                    lang=lang_code, 
-                    output_type=pytesseract.Output.DICT
-                )
+        pages = []
+        pending = deque()
+        with engines as apis, ThreadPoolExecutor(max_workers=workers) as pool:
+            for index, image in _rasterize_pages(pdf_doc, page_indices):
+                if len(pending) >= workers:
+                    pages.append(pending.popleft().result())
+                pending.append(pool.submit(_ocr_one_page, index, image, lang_code, apis))
 
-                pages.append({
-                    'page_number': i + 1,
-                    'text': text,
-                    'ocr_data': data,
-                    'image_size': image.size
-                })
-
-            except Exception as e:
-                logger.error(f"OCR識別第{i+1}頁失敗: {str(e)}")
-                pages.append({
-                    'page_number': i + 1,
-                    'text': "",
-                    'error': str(e)
-                })
+            pages.extend(future.result() for future in pending)
 
         return {'pages': pages}
 
-    async def _preprocess_image(self, image: Image.Image) -> Image.Image:
-        """圖像預處理以提高OCR準確性"""
-        # 轉換為OpenCV格式
-        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-
-        # 轉為灰度
-        gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-
-        # 去噪
-        denoised = cv2.medianBlur(gray, 3)
-
-        # 二值化
-        _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-        # 形態學操作
-        kernel = np.ones((1, 1), np.uint8)
-        processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-
-        # 轉回PIL格式
-        return Image.fromarray(processed)
-
-    async def _extract_metadata(self, pdf_content: bytes) -> Dict:
-        """提取PDF元數據"""
+    def _extract_metadata(self, pdf_content: PDFSource, pdf_doc: Optional[fitz.Document]) -> Dict:
+        """提取PDF元數據（優先讀取已打開的PyMuPDF文檔，無需重新解析）"""
         try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
-            metadata = pdf_reader.metadata
+            if pdf_doc is not None:
+                metadata = pdf_doc.metadata or {}
+                page_count = pdf_doc.page_count
+            else:
+                # PyMuPDF無法打開時讀取pdfplumber（pdfminer）的文檔信息字典
+                with pdfplumber.open(_as_file(pdf_content)) as pdf:
+                    info = pdf.metadata or {}
+                    page_count = len(pdf.pages)
+                metadata = {key: info.get(key[0].upper() + key[1:]) for key in _FITZ_METADATA_KEYS}
 
             return {
-                'title': metadata.get('/Title', ''),
-                'author': metadata.get('/Author', ''),
-                'subject': metadata.get('/Subject', ''),
-                'creator': metadata.get('/Creator', ''),
-                'producer': metadata.get('/Producer', ''),
-                'creation_date': str(metadata.get('/CreationDate', '')),
-                'modification_date': str(metadata.get('/ModDate', '')),
-                'page_count': len(pdf_reader.pages)
+                'title': metadata.get('title') or '',
+                'author': metadata.get('author') or '',
+                'subject': metadata.get('subject') or '',
+                'creator': metadata.get('creator') or '',
+                'producer': metadata.get('producer') or '',
+                'creation_date': metadata.get('creationDate') or '',
+                'modification_date': metadata.get('modDate') or '',
+                'page_count': page_count
             }
         except Exception as e:
             logger.warning(f"提取元數據失敗: {str(e)}")
             return {}
 
-    async def _analyze_document_structure(self, text_content: Dict) -> Dict:
-        """分析文檔結構"""
+    def _analyze_pages(self, pages: List[Dict]) -> Tuple[Dict, str]:
+        """
+        單次遍歷頁面，同時分析文檔結構並統計語言字符
+
+        Returns:
+            (文檔結構字典, 語言代碼)
+        """
         structure = {
             'headings': [],
             'sections': [],
@@ -249,8 +567,9 @@ class MultilingualPDFParser:
             'figures': [],
             'tables': []
         }
+        chinese_chars = japanese_chars = total_chars = 0
 
-        for page in text_content.get('pages', []):
+        for page in pages:
             text = page.get('text', '')
 
             # 檢測標題（基於格式和關鍵詞）
@@ -269,7 +588,13 @@ class MultilingualPDFParser:
             if page.get('tables'):
                 structure['tables'].extend(page['tables'])
 
-        return structure
+            # 語言字符計數；總字符數與按頁加空格拼接後的長度一致
+            chinese, japanese = _count_scripts(text)
+            chinese_chars += chinese
+            japanese_chars += japanese
+            total_chars += len(text) + 1
+
+        return structure, self._classify_language(chinese_chars, japanese_chars, total_chars)
 
     def _detect_headings(self, text: str) -> List[str]:
         """檢測標題"""
@@ -282,51 +607,35 @@ class MultilingualPDFParser:
                 continue
 
             # 檢測數字編號標題
-            if re.match(r'^\d+\.?\s+.+', line):
+            if _HEADING_NUM_RE.match(line):
                 headings.append(line)
             # 檢測全大寫標題
             elif line.isupper() and len(line) > 5:
                 headings.append(line)
             # 檢測特殊格式標題
-            elif re.match(r'^[A-Z][^.!?]*$', line) and len(line) < 100:
+            elif _HEADING_CAP_RE.match(line) and len(line) < 100:
                 headings.append(line)
 
         return headings
 
     def _detect_sections(self, text: str) -> List[str]:
         """檢測段落"""
+        # 全文不超過50個字符時不可能有合格段落，空白頁、短頁直接跳過
+        if len(text) <= 50:
+            return []
+
         # 按段落分割
-        paragraphs = re.split(r'\n\s*\n', text)
+        paragraphs = _PARA_SPLIT_RE.split(text)
         return [p.strip() for p in paragraphs if len(p.strip()) > 50]
 
     def _detect_references(self, text: str) -> List[str]:
         """檢測參考文獻"""
-        references = []
-
-        # 檢測引用格式
-        patterns = [
-            r'\[\d+\]',  # [1]
-            r'\(\d+\)',  # (1)
-            r'\w+\s+et\s+al\.?,?\s+\d{4}',  # Author et al., 2023
-        ]
-
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            references.extend(matches)
-
-        return list(set(references))
-
-    async def _detect_language(self, text_content: Dict) -> str:
-        """檢測文檔主要語言"""
-        full_text = ""
-        for page in text_content.get('pages', []):
-            full_text += page.get('text', '') + " "
-
-        # 簡單的語言檢測邏輯
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', full_text))
-        japanese_chars = len(re.findall(r'[\u3040-\u309f\u30a0-\u30ff]', full_text))
-        total_chars = len(full_text)
+        # 檢測引用格式，按首次出現順序去重
+        return list(dict.fromkeys(_REF_RE.findall(text)))
 
+    @staticmethod
+    def _classify_language(chinese_chars: int, japanese_chars: int, total_chars: int) -> str:
+        """按中文字符與日文假名佔比判斷文檔主要語言"""
         if chinese_chars / max(total_chars, 1) > 0.1:
             return 'zh'
         elif japanese_chars / max(total_chars, 1) > 0.1:
@@ -336,3 +645,7 @@ class MultilingualPDFParser:
 
 # 創建全局實例
 pdf_parser = MultilingualPDFParser()
+
+def parse_pdf_sync(pdf_content: PDFSource, language: str = 'auto') -> Dict:
+    """同步解析入口，供進程池調用"""
+    return asyncio.run(pdf_parser.parse_pdf(pdf_content, language))
@@ -0,0 +1,115 @@
+
+import asyncio
+from typing import List, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.molecular_visualizer import molecular_calculator
+
+class MolecularPropertyBatcher:
+    """合併併發的分子性質請求，按數量或時間閾值批量計算"""
+
+    def __init__(self, max_batch_size: int, flush_interval_ms: int):
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    def start(self):
+        """啟動後台批處理任務（需在事件循環中調用）"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def stop(self):
+        """停止批處理任務，並中止未完成的請求"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("批處理服務已停止"))
+
+    async def submit(self, smiles_list: List[str]) -> List[Optional[Dict]]:
+        """
+        提交一組SMILES並等待所在批次計算完成
+
+        Returns:
+            與smiles_list等長的列表，計算失敗的分子對應None
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((smiles_list, future))
+        return await future
+
+    async def _run(self):
+        """收集請求直到達到數量閾值或超時，然後刷新"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            count = len(batch[0][0])
+            deadline = loop.time() + self.flush_interval
+
+            while count < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                count += len(item[0])
+
+            # 刷新在獨立任務中進行，不阻塞下一批的收集
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        """一次計算整批分子，並按索引區間分發回各請求"""
+        merged = [smiles for smiles_list, _ in batch for smiles in smiles_list]
+        logger.debug(f"批量計算{len(merged)}個分子（合併{len(batch)}個請求）")
+
+        try:
+            # 整批分子按工作進程數分塊並行計算
+            molecules = await molecular_calculator.calculate_molecules(merged)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for smiles_list, future in batch:
+            part = molecules[offset:offset + len(smiles_list)]
+            offset += len(smiles_list)
+
+            # 按請求內的位置重新編號
+            for i, mol in enumerate(part):
+                if mol is not None:
+                    mol['id'] = f"molecule_{i+1}"
+
+            if not future.done():
+                future.set_result(part)
+
+# 創建全局實例
+property_batcher = MolecularPropertyBatcher(
+    max_batch_size=settings.BATCH_MAX_MOLECULES,
+    flush_interval_ms=settings.BATCH_FLUSH_MS
+)
@@ -0,0 +1,149 @@
+
+"""
+分子指紋的緊湊表示與批量Tanimoto相似性計算
+
+將RDKit位向量打包為(N, W)的np.uint64矩陣（每行一個分子），
+以按位與 + popcount計算交集，避免逐對調用DataStructs.TanimotoSimilarity。
+"""
+
+import base64
+from typing import List, Sequence
+
+import numpy as np
+from rdkit.Chem import rdFingerprintGenerator
+
+from app.utils.jit import njit, prange
+
+# Morgan指紋參數
+MORGAN_RADIUS = 2
+MORGAN_FP_SIZE = 1024
+
+# 指紋生成器在模塊加載時創建一次，各次調用共用
+_MORGAN_GENERATOR = rdFingerprintGenerator.GetMorganGenerator(radius=MORGAN_RADIUS, fpSize=MORGAN_FP_SIZE)
+
+# 分塊大小：64x64個分子對的指紋可放入L1緩存
+TILE = 64
+
+# SWAR popcount常量
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def morgan_fingerprints(mols: Sequence) -> List:
+    """批量生成Morgan位向量；RDKit提供批量接口（GetFingerprints）時直接使用"""
+    bulk = getattr(_MORGAN_GENERATOR, "GetFingerprints", None)
+    if bulk is not None:
+        return list(bulk(list(mols)))
+    return [_MORGAN_GENERATOR.GetFingerprint(mol) for mol in mols]
+
+
+def pack_bit_strings(bit_strings: Sequence[str]) -> np.ndarray:
+    """
+    將等長的'0'/'1'字符串列表打包為(N, W)的uint64矩陣
+
+    Returns:
+        每行為一個分子指紋的uint64矩陣，位數不足64倍數時補零
+    """
+    if not bit_strings:
+        return np.zeros((0, 0), dtype=np.uint64)
+
+    n_bits = len(bit_strings[0])
+    n_words = (n_bits + 63) // 64
+    bits = np.zeros((len(bit_strings), n_words * 64), dtype=np.uint8)
+
+    for i, bit_string in enumerate(bit_strings):
+        bits[i, :n_bits] = np.frombuffer(bit_string.encode("ascii"), dtype=np.uint8) - ord("0")
+
+    return np.packbits(bits, axis=1).view(np.uint64)
+
+
+def pack_fingerprints(fps: Sequence) -> np.ndarray:
+    """
+    將RDKit ExplicitBitVect列表打包為(N, W)的uint64矩陣
+
+    Args:
+        fps: 位數相同的RDKit位向量列表
+
+    Returns:
+        每行為一個分子指紋的uint64矩陣，位數不足64倍數時補零
+    """
+    return pack_bit_strings([fp.ToBitString() for fp in fps])
+
+
+def encode_fingerprint(fp) -> str:
+    """將RDKit位向量按位打包（高位在前）後編碼為base64字符串，1024位指紋僅佔128字節"""
+    bits = np.frombuffer(fp.ToBitString().encode("ascii"), dtype=np.uint8) - ord("0")
+    return base64.b64encode(np.packbits(bits).tobytes()).decode("ascii")
+
+
+def decode_fingerprints(encoded: Sequence[str]) -> np.ndarray:
+    """
+    將encode_fingerprint產生的等長base64字符串列表解碼為(N, W)的uint64矩陣
+
+    Returns:
+        每行為一個分子指紋的uint64矩陣，可直接傳入tanimoto_matrix
+    """
+    if not encoded:
+        return np.zeros((0, 0), dtype=np.uint64)
+
+    raw = [base64.b64decode(s) for s in encoded]
+    n_bytes = len(raw[0])
+    packed = np.zeros((len(raw), (n_bytes + 7) // 8 * 8), dtype=np.uint8)
+
+    for i, data in enumerate(raw):
+        packed[i, :n_bytes] = np.frombuffer(data, dtype=np.uint8)
+
+    return packed.view(np.uint64)
+
+
+@njit(cache=True)
+def _popcount(x):
+    """64位整數的置位數（SWAR算法，LLVM可將其識別為popcnt指令）"""
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+
+@njit(parallel=True, cache=True)
+def popcount_rows(fps: np.ndarray) -> np.ndarray:
+    """每個指紋的置位總數（int32累加，指紋位數遠小於2^31）"""
+    n, w = fps.shape
+    counts = np.zeros(n, dtype=np.int32)
+    for i in prange(n):
+        total = np.int32(0)
+        for k in range(w):
+            total += np.int32(_popcount(fps[i, k]))
+        counts[i] = total
+    return counts
+
+
+@njit(parallel=True, cache=True)
+def tanimoto_matrix(fps: np.ndarray) -> np.ndarray:
+    """
+    計算N×N的Tanimoto相似性矩陣
+
+    按TILE×TILE分塊遍歷上三角，並行維度為行塊；與RDKit一致，兩個空指紋的相似性為1。
+    """
+    n, w = fps.shape
+    counts = popcount_rows(fps)
+    sim = np.eye(n)
+    n_blocks = (n + TILE - 1) // TILE
+
+    for bi in prange(n_blocks):
+        i_end = min(n, (bi + 1) * TILE)
+        for bj in range(bi, n_blocks):
+            j_end = min(n, (bj + 1) * TILE)
+            for i in range(bi * TILE, i_end):
+                for j in range(max(i + 1, bj * TILE), j_end):
+                    inter = np.int32(0)
+                    for k in range(w):
+                        inter += np.int32(_popcount(fps[i, k] & fps[j, k]))
+                    union = counts[i] + counts[j] - inter
+                    s = inter / union if union > 0 else 1.0
+                    sim[i, j] = s
+                    sim[j, i] = s
+
+    return sim
@@ -0,0 +1,30 @@
+
+"""
+Numba JIT 兼容層
+
+未安裝numba時退化為普通Python函數，保證功能可用（僅失去加速）。
+"""
+
+import os
+
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+
+    # 並行內核可能在工作線程中首次啟動（如asyncio.to_thread），
+    # TBB線程層在此情況下會導致解釋器退出時掛起，優先使用OpenMP
+    if "NUMBA_THREADING_LAYER_PRIORITY" not in os.environ:
+        numba.config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+except ImportError:  # pragma: no cover
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """無numba時的空裝飾器，兼容@njit與@njit(...)兩種寫法"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
+
+    prange = range
+
+__all__ = ["njit", "prange", "NUMBA_AVAILABLE"]
@@ -0,0 +1,59 @@
+
+"""
+多關鍵詞子串匹配
+
+安裝pyahocorasick時以Aho–Corasick自動機單次線性掃描文本，
+未安裝時退化為逐詞str.find（結果相同，僅失去加速）。
+"""
+
+from typing import Iterable, List, Tuple
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    AHOCORASICK_AVAILABLE = False
+
+
+class KeywordMatcher:
+    """一組關鍵詞的子串匹配器，語義與`keyword in text`一致"""
+
+    def __init__(self, keywords: Iterable[str]):
+        # 去重並保留原始順序，結果按此順序返回
+        self.keywords: Tuple[str, ...] = tuple(dict.fromkeys(keywords))
+        self._order = {keyword: i for i, keyword in enumerate(self.keywords)}
+
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and self.keywords:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+    def contains_any(self, text: str) -> bool:
+        """文本中是否出現任一關鍵詞"""
+        if self._automaton is not None:
+            return next(self._automaton.iter(text), None) is not None
+        return any(keyword in text for keyword in self.keywords)
+
+    def find_all(self, text: str) -> List[Tuple[str, int]]:
+        """
+        查找文本中出現的關鍵詞
+
+        Returns:
+            (關鍵詞, 首次出現位置)列表，按關鍵詞原始順序排列，每個關鍵詞至多一項
+        """
+        if self._automaton is None:
+            hits = ((keyword, text.find(keyword)) for keyword in self.keywords)
+            return [(keyword, start) for keyword, start in hits if start != -1]
+
+        # 自動機按結束位置遞增輸出，每個關鍵詞第一次命中即為其首次出現
+        first = {}
+        for end, keyword in self._automaton.iter(text):
+            if keyword not in first:
+                first[keyword] = end - len(keyword) + 1
+
+        return sorted(first.items(), key=lambda hit: self._order[hit[0]])
+
+
+__all__ = ["KeywordMatcher", "AHOCORASICK_AVAILABLE"]
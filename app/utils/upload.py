@@ -0,0 +1,224 @@
+
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiofiles
+from fastapi import HTTPException, Request, UploadFile
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.config import settings
+
+# 上傳大小上限（Settings不可變，導入時綁定即可）
+_MAX_FILE_SIZE = settings.MAX_FILE_SIZE
+
+# 每次從上傳流讀取的塊大小
+UPLOAD_CHUNK_SIZE = 1 << 16  # 64KB
+
+# 文件類型識別所需的頭部字節數
+SNIFF_BYTES = 8
+
+# 各類文件的魔數
+_MAGIC = {
+    "pdf": (b"%PDF-",),
+    "image": (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff"),
+}
+
+
+def sniff(buf: bytes, kind: str) -> bool:
+    """根據文件頭魔數判斷內容是否為指定類型（pdf / image）"""
+    return buf.startswith(_MAGIC[kind])
+
+
+def _sniff_head(head: bytes, data: bytes, kind: Optional[str]) -> bytes:
+    """累積文件頭部字節，湊足後立即校驗，不符合則中止上傳"""
+    if kind is None or len(head) >= SNIFF_BYTES:
+        return head
+    head += data[:SNIFF_BYTES - len(head)]
+    if len(head) >= SNIFF_BYTES and not sniff(head, kind):
+        raise HTTPException(status_code=415, detail="文件內容與類型不符")
+    return head
+
+
+def _check_short_head(head: bytes, kind: Optional[str]):
+    """文件不足SNIFF_BYTES時在接收完畢後校驗"""
+    if kind is not None and len(head) < SNIFF_BYTES and not sniff(head, kind):
+        raise HTTPException(status_code=415, detail="文件內容與類型不符")
+
+
+@asynccontextmanager
+async def stream_upload_to_disk(
+    file: UploadFile,
+    suffix: str = ".pdf",
+    hasher: Optional[Any] = None,
+    kind: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    分塊將上傳文件寫入臨時文件，超過大小限制立即中止
+
+    Args:
+        file: 上傳文件
+        suffix: 臨時文件後綴
+        hasher: 可選的hashlib對象，寫入時同步更新摘要
+        kind: 可選的文件類型（pdf / image），按文件頭魔數校驗
+
+    Yields:
+        臨時文件路徑（離開上下文後自動刪除）
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=settings.UPLOAD_DIR)
+    os.close(fd)
+
+    try:
+        total = 0
+        head = b""
+        async with aiofiles.open(path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                head = _sniff_head(head, chunk, kind)
+                total += len(chunk)
+                if total > _MAX_FILE_SIZE:
+                    raise HTTPException(status_code=413, detail="文件過大")
+                if hasher is not None:
+                    hasher.update(chunk)
+                await out.write(chunk)
+
+        _check_short_head(head, kind)
+
+        yield path
+
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+@dataclass
+class StreamedForm:
+    """流式解析的multipart表單"""
+    path: str
+    filename: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+@asynccontextmanager
+async def stream_multipart_to_disk(
+    request: Request,
+    file_field: str = "file",
+    suffix: str = ".pdf",
+    hasher: Optional[Any] = None,
+    kind: Optional[str] = None
+) -> AsyncIterator[StreamedForm]:
+    """
+    直接從請求體流式解析multipart表單，文件部分邊接收邊寫入臨時文件
+
+    相比UploadFile，省去Starlette先將整個請求體緩存到SpooledTemporaryFile的一次完整複製。
+
+    Args:
+        request: 原始請求
+        file_field: 文件字段名
+        suffix: 臨時文件後綴
+        hasher: 可選的hashlib對象，寫入時同步更新摘要
+        kind: 可選的文件類型（pdf / image），按文件頭魔數校驗
+
+    Yields:
+        StreamedForm（臨時文件離開上下文後自動刪除）
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="請求必須為multipart/form-data")
+
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=settings.UPLOAD_DIR)
+    os.close(fd)
+
+    form = StreamedForm(path=path, filename="")
+    file_chunks: List[bytes] = []
+    part: Dict[str, Any] = {}
+    finished = False
+
+    def on_part_begin():
+        part.clear()
+        part.update(headers={}, header_field=b"", header_value=b"", value=b"")
+
+    def on_header_field(data: bytes, start: int, end: int):
+        part["header_field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        part["header_value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["header_field"].lower()] = part["header_value"]
+        part["header_field"] = part["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = options.get(b"name", b"").decode("utf-8")
+        filename = options.get(b"filename")
+        part["is_file"] = part["name"] == file_field and filename is not None
+        # 其他文件字段直接丟棄
+        part["skip"] = filename is not None and not part["is_file"]
+        if part["is_file"]:
+            form.filename = filename.decode("utf-8")
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if part["is_file"]:
+            file_chunks.append(data[start:end])
+        elif not part["skip"]:
+            part["value"] += data[start:end]
+
+    def on_part_end():
+        if not part["is_file"] and not part["skip"]:
+            form.fields[part["name"]] = part["value"].decode("utf-8", errors="replace")
+
+    def on_end():
+        nonlocal finished
+        finished = True
+
+    parser = MultipartParser(params[b"boundary"], callbacks={
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_end": on_end,
+    })
+
+    try:
+        total = 0
+        head = b""
+        async with aiofiles.open(path, "wb") as out:
+            async for chunk in request.stream():
+                parser.write(chunk)
+
+                # 解析回調是同步的，收集到的文件數據在此異步寫出
+                for data in file_chunks:
+                    head = _sniff_head(head, data, kind)
+                    total += len(data)
+                    if total > _MAX_FILE_SIZE:
+                        raise HTTPException(status_code=413, detail="文件過大")
+                    if hasher is not None:
+                        hasher.update(data)
+                    await out.write(data)
+                file_chunks.clear()
+
+        parser.finalize()
+
+        # 未讀到結束邊界：請求體被截斷，已寫出的文件不完整
+        if not finished:
+            raise HTTPException(status_code=400, detail="multipart請求體不完整")
+
+        if not form.filename:
+            raise HTTPException(status_code=400, detail=f"缺少文件字段: {file_field}")
+
+        _check_short_head(head, kind)
+
+        yield form
+
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -391,6 +391,7 @@ function displayComprehensiveResults(data) {
 
     html += '</div>';
     container.innerHTML = html;
+    renderCharts(container, data.molecular_properties?.visualizations);
 }
 
 // 顯示PDF結果
@@ -439,6 +440,7 @@ function displayMolecularResults(data) {
         </div>
     `;
     container.innerHTML = html;
+    renderCharts(container, data.visualizations);
 }
 
 // 創建PDF結果部分
@@ -765,12 +767,12 @@ function createMolecularResultSection(data) {
         `;
 
         Object.entries(data.visualizations).forEach(([key, chart]) => {
-            if (chart && typeof chart === 'string') {
+            if (chart && chart.data) {
                 html += `
                     <div class="col-12 mb-4">
                         <div class="chart-container">
                             <h6>${getChartTitle(key)}</h6>
-                            ${chart}
+                            <div class="plotly-chart" data-chart="${key}"></div>
                         </div>
                     </div>
                 `;
@@ -784,6 +786,20 @@ function createMolecularResultSection(data) {
     return html;
 }
 
+// 將圖表規格（data/layout）渲染到對應的佔位元素
+function renderCharts(container, visualizations) {
+    if (!visualizations || typeof Plotly === 'undefined') {
+        return;
+    }
+
+    container.querySelectorAll('.plotly-chart').forEach(el => {
+        const chart = visualizations[el.dataset.chart];
+        if (chart && chart.data) {
+            Plotly.newPlot(el, chart.data, chart.layout, {responsive: true});
+        }
+    });
+}
+
 // 獲取圖表標題
 function getChartTitle(key) {
     const titles = {
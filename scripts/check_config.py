@@ -27,7 +27,6 @@ def check_system_dependencies():
 
     dependencies = {
         'tesseract': 'tesseract --version',
-        'poppler': 'pdftoppm -h',
         'curl': 'curl --version'
     }
 
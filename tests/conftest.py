@@ -0,0 +1,14 @@
+
+"""
+測試公共設置
+"""
+
+import os
+import sys
+
+# 添加項目路徑到Python路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 配置要求的連接串；被測代碼不會實際連接數據庫或Redis
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
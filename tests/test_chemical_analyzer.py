@@ -0,0 +1,43 @@
+
+"""
+化學分析器文本提取的回歸測試（期望值與改寫前的實現逐項對照）
+"""
+
+import pytest
+
+from app.services.chemical_analyzer import chem_analyzer
+
+
+@pytest.mark.parametrize("text, expected", [
+    # 官能團之間重疊（COOH內含OH），每個官能團都要報告
+    ("R-COOH", ["hydroxyl", "carboxyl", "ester"]),
+    ("C6H5CH2Cl", ["phenyl", "benzyl"]),
+    ("NH2CH2COOH", ["hydroxyl", "carboxyl", "amino", "ester"]),
+])
+def test_functional_groups_overlap(text, expected):
+    assert chem_analyzer._analyze_text_chemistry(text)['functional_groups'] == expected
+
+
+def test_functional_groups_shared_pattern():
+    """模式相同的官能團（carbonyl與ketone）同時報告"""
+    groups = chem_analyzer._analyze_text_chemistry("C=O")['functional_groups']
+    assert {"carbonyl", "ketone"} <= set(groups)
+
+
+@pytest.mark.parametrize("text, smiles, formulas", [
+    # 改寫前的字符集模式同樣找到這些SMILES，另外還把Ethanol、were等普通單詞當成SMILES
+    ("Ethanol CCO and acetic acid CC(=O)O were mixed.", ["CCO", "CC(=O)O"], ["CCO", "CC"]),
+    ("Salt [Na+].[Cl-] and charged C[N+](C)(C)C, stereo F/C=C/F, N#N.",
+     ["[Na+]", "[Cl-]", "C[N+](C)(C)C", "F/C=C/F", "N#N"], []),
+    ("Isomer C[C@H](N)C(=O)O, ring C1CC1, bromide CBr, CCl4.",
+     ["C[C@H](N)C(=O)O", "C1CC1", "CBr", "CCl4"], ["C1CC1", "CBr", "CCl4"]),
+    # 改寫前不識別芳香小寫原子（c1ccccc1）
+    ("Benzene c1ccccc1 reacts with Cl2; aspirin CC(=O)Oc1ccccc1C(=O)O.",
+     ["c1ccccc1", "Cl2", "CC(=O)Oc1ccccc1C(=O)O"], ["CC"]),
+    # 詞元後緊跟字母數字時整段放棄，不截斷出CCO2之類的片段
+    ("Run 2024 used 300 mg of sample ID ABC123 and CCO2x.", [], []),
+])
+def test_smiles_and_formula_tokens(text, smiles, formulas):
+    result = chem_analyzer._analyze_text_chemistry(text)
+    assert result['smiles'] == smiles
+    assert result['molecular_formulas'] == formulas
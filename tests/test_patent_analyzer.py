@@ -0,0 +1,87 @@
+
+"""
+專利權利要求分析的回歸測試
+"""
+
+import pytest
+
+from app.services.patent_analyzer import get_patent_analyzer
+
+
+def test_dependency_levels_deep_chain():
+    """長依賴鏈按拓撲順序逐層計算，不受遞歸深度限制"""
+    tree = {n: ([n - 1] if n > 1 else []) for n in range(1, 5001)}
+    levels = get_patent_analyzer()._calculate_dependency_levels(tree)
+    assert levels[1] == 0
+    assert levels[5000] == 4999
+
+
+def test_dependency_levels_cycle():
+    """循環中的權利要求及依賴循環的權利要求層級為無窮大"""
+    tree = {1: [], 2: [1, 3], 3: [2], 4: [3], 5: [1]}
+    levels = get_patent_analyzer()._calculate_dependency_levels(tree)
+    assert levels == {1: 0, 2: float('inf'), 3: float('inf'), 4: float('inf'), 5: 1}
+
+
+def test_extract_context_offsets_follow_original_text():
+    """lower()改變長度的字符在關鍵詞之前時，上下文仍以關鍵詞為中心"""
+    analyzer = get_patent_analyzer()
+    text = "İ" * 60 + " a NOVEL catalyst " + "x" * 60
+    text_lower = text.lower()
+    start = text_lower.find("novel")
+
+    context = analyzer._extract_context(text, text_lower, "novel", start, window=5)
+    assert "NOVEL" in context
+    assert context == text[text.index("NOVEL") - 5:text.index("NOVEL") + 10].strip()
+
+
+_EN_CLAIMS = (
+    "Claims\n1. A compound of formula C6H12O6 comprising a hydroxyl group, heated at 80 °C for 2 h.\n"
+    "2. The compound according to claim 1, wherein the solvent is NaCl solution of 3.5 percent.\n"
+    "Claim 3. A method of preparing the compound of claim 1 at 1.5 MPa.\n"
+    "4. Use of the compound of claim 2 as a catalyst."
+)
+_ZH_CLAIMS = (
+    "權利要求1：一種化合物，其分子式為C2H5OH，於80℃反應2小時。"
+    "權利要求2：根據權利要求1所述的化合物，其中濃度為3.5%。"
+    "3. 一種製備權利要求1所述化合物的方法，壓力為1.5MPa。"
+)
+
+
+@pytest.mark.parametrize("text, language, expected", [
+    # 改寫前的逐模式實現同樣找到這些編號，但會重複收錄並在「claim 1」「3.5」處截斷正文
+    (_EN_CLAIMS, "en", [
+        (1, "A compound of formula C6H12O6 comprising a hydroxyl group, heated at 80 °C for 2 h."),
+        (2, "The compound according to claim 1, wherein the solvent is NaCl solution of 3.5 percent."),
+        (3, "A method of preparing the compound of claim 1 at 1.5 MPa."),
+        (4, "Use of the compound of claim 2 as a catalyst."),
+    ]),
+    (_ZH_CLAIMS, "zh", [
+        (1, "一種化合物，其分子式為C2H5OH，於80℃反應2小時。"),
+        (2, "根據權利要求1所述的化合物，其中濃度為3.5%。"),
+        (3, "一種製備權利要求1所述化合物的方法，壓力為1.5MPa。"),
+    ]),
+])
+def test_extract_claims_mixed_headers(text, language, expected):
+    """關鍵詞編號與純數字編號混排時，每條權利要求都在下一個標頭處結束"""
+    claims = get_patent_analyzer()._extract_claims(text, language)
+    assert [(claim['number'], claim['text']) for claim in claims] == expected
+
+
+def test_technical_features_skip_single_element_matches():
+    """分子式模式要求至少兩個元素單元：結果等於改寫前的輸出去掉單個字母/元素的匹配"""
+    claims = [{
+        'number': 1,
+        'text': "A method of heating C6H12O6 with NaCl and H2O at 80 °C for 2 h, "
+                "giving a compound with a hydroxyl group.",
+        'type': 'method',
+        '_lower': ''
+    }]
+    features = get_patent_analyzer()._extract_technical_features(claims, 'en')
+
+    baseline = {
+        'A', 'C', 'C6H12O6', 'H2O', 'NaCl', 'a', 'and', 'at', 'compound', 'for', 'giving',
+        'group', 'h', 'heating', 'hydroxyl', 'method', 'of', 'with'
+    }
+    assert set(features['chemical_entities']) == baseline - {'A', 'C', 'a', 'h'}
+    assert sorted(features['parameters']) == ['2', '6', '80']
@@ -0,0 +1,66 @@
+
+"""
+綜合分析流水線的停止與錯誤隔離測試
+"""
+
+import asyncio
+
+import pytest
+
+from app import pipeline
+from app.core.cache import PDF_CACHE
+
+
+def _job(loop) -> pipeline.PipelineJob:
+    return pipeline.PipelineJob(
+        upload=None,
+        language="en",
+        include_molecular_analysis=True,
+        include_patent_analysis=False,
+        future=loop.create_future()
+    )
+
+
+@pytest.mark.asyncio
+async def test_stop_fails_jobs_in_dispatched_batches(monkeypatch):
+    """stop()取消已分發的分析批次，等待中的請求方收到異常而不是一直掛起"""
+    started = asyncio.Event()
+
+    async def never_finishes(job):
+        started.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(pipeline, "_analyze", never_finishes)
+
+    flow = pipeline.ComprehensivePipeline(workers_per_stage=1, queue_size=2)
+    flow.start()
+    job = _job(asyncio.get_running_loop())
+    await flow._queues[2].put(job)
+    await asyncio.wait_for(started.wait(), 1)
+
+    await flow.stop()
+
+    assert not flow._flushes
+    with pytest.raises(RuntimeError):
+        job.future.result()
+
+
+@pytest.mark.asyncio
+async def test_chem_pipeline_keeps_chem_result_when_molecules_fail(monkeypatch):
+    """分子性質計算失敗時保留化學分析結果，且不緩存不完整的結果"""
+    chem_result = {'smiles': ['CCO']}
+
+    async def fake_run_in_pool(func, *args):
+        return chem_result
+
+    async def failing_calculate(smiles_list):
+        raise RuntimeError("進程池已關閉")
+
+    monkeypatch.setattr(pipeline, "run_in_pool", fake_run_in_pool)
+    monkeypatch.setattr(pipeline.molecular_calculator, "calculate_molecules", failing_calculate)
+
+    cache_key = ("test-chem-pipeline", "en")
+    result = await pipeline._chem_pipeline(cache_key, "CCO")
+
+    assert result == (chem_result, None)
+    assert (cache_key, "chem") not in PDF_CACHE
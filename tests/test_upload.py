@@ -0,0 +1,76 @@
+
+"""
+上傳流式接收與文件類型校驗測試
+"""
+
+import fitz
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils import upload
+from app.utils.upload import sniff
+
+client = TestClient(app)
+
+_BOUNDARY = "test-boundary"
+
+
+def _pdf_bytes() -> bytes:
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Claim 1. A compound comprising CCO.")
+    return doc.tobytes()
+
+
+def _multipart(content: bytes, closed: bool = True) -> bytes:
+    body = (
+        f"--{_BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="test.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + content
+    if closed:
+        body += f"\r\n--{_BOUNDARY}--\r\n".encode()
+    return body
+
+
+def _post(body: bytes):
+    return client.post(
+        "/api/v1/parse-pdf",
+        content=body,
+        headers={"content-type": f"multipart/form-data; boundary={_BOUNDARY}"}
+    )
+
+
+@pytest.mark.parametrize("head, kind, expected", [
+    (b"%PDF-1.7\n", "pdf", True),
+    (b"\x89PNG\r\n\x1a\n", "image", True),
+    (b"\xff\xd8\xff\xe0", "image", True),
+    (b"PK\x03\x04", "pdf", False),
+    (b"%PDF-1.7\n", "image", False),
+])
+def test_sniff(head, kind, expected):
+    assert sniff(head, kind) is expected
+
+
+def test_parse_pdf_valid():
+    response = _post(_multipart(_pdf_bytes()))
+    assert response.status_code == 200
+    assert response.json()["page_count"] == 1
+
+
+def test_parse_pdf_wrong_magic_bytes():
+    """擴展名為.pdf但內容不是PDF"""
+    response = _post(_multipart(b"PK\x03\x04" + b"\x00" * 64))
+    assert response.status_code == 415
+
+
+def test_parse_pdf_oversize(monkeypatch):
+    monkeypatch.setattr(upload, "_MAX_FILE_SIZE", 1024)
+    response = _post(_multipart(b"%PDF-1.7\n" + b"\x00" * 4096))
+    assert response.status_code == 413
+
+
+def test_parse_pdf_truncated_multipart():
+    """缺少結束邊界的請求體不進入解析"""
+    response = _post(_multipart(_pdf_bytes()[:200], closed=False))
+    assert response.status_code == 400